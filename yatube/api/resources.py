@@ -0,0 +1,106 @@
+"""Описание ресурсов API: какие поля отдаются и как они читаются.
+
+Строки читаются через values(): связанные поля подтягиваются JOIN-ом
+в том же запросе, а модели не создаются вовсе.
+"""
+from django.core.files.storage import default_storage
+
+from posts.models import Comment, Follow, Group, Post
+
+
+def image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class Resource:
+    def __init__(self, queryset, fields, filters=None, converters=None,
+                 owner=None):
+        # Имя поля в ответе -> путь поля в ORM
+        self.queryset = queryset
+        self.fields = fields
+        self.filters = filters or {}
+        self.converters = converters or {}
+        # Поле пользователя: такой ресурс отдается только владельцу
+        self.owner = owner
+
+    def visible(self, user):
+        """Записи, которые видит пользователь; None, если нужен вход."""
+        if self.owner is None:
+            return self.queryset
+        if not user.is_authenticated:
+            return None
+        return self.queryset.filter(**{self.owner: user})
+
+    def select(self, names=None):
+        """Пути ORM для запрошенных полей; KeyError для неизвестных."""
+        names = names or list(self.fields)
+        return {name: self.fields[name] for name in names}
+
+    def filter(self, queryset, params):
+        lookups = {
+            path: params[name]
+            for name, path in self.filters.items() if name in params
+        }
+        return queryset.filter(**lookups)
+
+    def values(self, queryset, selected):
+        return queryset.values(*selected.values())
+
+    def convert(self, row, selected):
+        """Словарь в том виде, в каком он уйдет клиенту."""
+        result = {}
+        for name, path in selected.items():
+            value = row[path]
+            if name in self.converters:
+                value = self.converters[name](value)
+            result[name] = value
+        return result
+
+
+RESOURCES = {
+    'posts': Resource(
+        Post.objects.all(),
+        fields={
+            'id': 'id',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'updated': 'updated',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'image': 'image',
+        },
+        filters={'author': 'author__username', 'group': 'group__slug'},
+        converters={'image': image_url},
+    ),
+    'groups': Resource(
+        Group.objects.all(),
+        fields={
+            'id': 'id',
+            'title': 'title',
+            'slug': 'slug',
+            'description': 'description',
+        },
+    ),
+    'comments': Resource(
+        Comment.objects.all(),
+        fields={
+            'id': 'id',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+        filters={'post': 'post_id', 'author': 'author__username'},
+    ),
+    # Подписки видны только самому читателю
+    'follows': Resource(
+        Follow.objects.all(),
+        fields={
+            'id': 'id',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        filters={'author': 'author__username'},
+        owner='user',
+    ),
+}
@@ -0,0 +1,142 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        ]
+        Post.objects.create(author=cls.reader, text='Без группы')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pagination(self):
+        """Курсор обходит все посты без пропусков и повторов"""
+        url = reverse('api:list', kwargs={'name': 'posts'})
+        seen, params = [], {'limit': 4}
+        while True:
+            page = self.get_json(url, **params)
+            seen += [post['id'] for post in page['results']]
+            if page['next'] is None:
+                break
+            params['after'] = page['next']
+        self.assertEqual(
+            seen, list(Post.objects.order_by('-pk').values_list(
+                'pk', flat=True)))
+
+    def test_fields_and_filters(self):
+        """Поля выбираются параметром fields, фильтры сужают выборку"""
+        page = self.get_json(
+            reverse('api:list', kwargs={'name': 'posts'}),
+            fields='text,author', group='group', limit=1)
+        self.assertEqual(
+            page['results'], [{'text': 'Пост 4', 'author': 'author'}])
+
+    def test_detail(self):
+        """Ресурс отдается по id, связи раскрываются в читаемые ключи"""
+        comment = Comment.objects.get()
+        data = self.get_json(reverse(
+            'api:detail', kwargs={'name': 'comments', 'pk': comment.pk}))
+        self.assertEqual(data['author'], 'reader')
+        self.assertEqual(data['post'], self.posts[0].pk)
+
+    def test_errors_are_json(self):
+        """Ошибки запроса возвращаются в JSON с нужным статусом"""
+        cases = (
+            (reverse('api:list', kwargs={'name': 'posts'}),
+             {'fields': 'password'}, 400),
+            (reverse('api:list', kwargs={'name': 'posts'}),
+             {'after': '!!!'}, 400),
+            (reverse('api:list', kwargs={'name': 'users'}), {}, 404),
+            (reverse('api:detail', kwargs={'name': 'groups', 'pk': 999}),
+             {}, 404),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url, params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_list_is_single_query(self):
+        """Страница API читается одним запросом вместе со связями"""
+        url = reverse('api:list', kwargs={'name': 'posts'})
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_follows_belong_to_reader(self):
+        """Подписки видны только самому читателю и только после входа"""
+        url = reverse('api:list', kwargs={'name': 'follows'})
+        self.assertEqual(self.client.get(url).status_code, 403)
+        follow = Follow.objects.get()
+        detail = reverse(
+            'api:detail', kwargs={'name': 'follows', 'pk': follow.pk})
+        self.assertEqual(self.staff_client.get(url).json()['results'], [])
+        self.assertEqual(self.staff_client.get(detail).status_code, 404)
+        self.client.force_login(self.reader)
+        self.assertEqual(
+            self.get_json(url)['results'],
+            [{'id': follow.pk, 'user': 'reader', 'author': 'author'}])
+
+    def test_export_needs_staff_or_token(self):
+        """Экспорт доступен сотрудникам и по токену, остальным 403"""
+        url = reverse('api:export', kwargs={'name': 'groups'})
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        with override_settings(API_EXPORT_TOKEN='secret'):
+            response = Client().get(url, HTTP_AUTHORIZATION='Token secret')
+            self.assertEqual(response.status_code, 200)
+            response = Client().get(url, HTTP_AUTHORIZATION='Token wrong')
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(API_EXPORT_LIMIT=2)
+    def test_export_is_rate_limited(self):
+        """Сверх API_EXPORT_LIMIT выгрузок за период отвечает 429"""
+        url = reverse('api:export', kwargs={'name': 'groups'})
+        statuses = [
+            self.staff_client.get(url).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_export_streams_ndjson(self):
+        """Экспорт отдает все записи потоком по строке на запись"""
+        response = self.staff_client.get(
+            reverse('api:export', kwargs={'name': 'posts'}),
+            {'author': 'author', 'fields': 'id'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{'id': post.pk} for post in self.posts])
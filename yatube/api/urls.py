@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('<str:name>/', views.resource_list, name='list'),
+    path('<str:name>/export/', views.resource_export, name='export'),
+    path('<str:name>/<int:pk>/', views.resource_detail, name='detail'),
+]
@@ -0,0 +1,184 @@
+import binascii
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.crypto import constant_time_compare
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .resources import RESOURCES
+
+DEFAULT_LIMIT: int = 50
+MAX_LIMIT: int = 500
+EXPORT_CHUNK_SIZE: int = 2000
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class Forbidden(Exception):
+    pass
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+def encode_cursor(pk):
+    return urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return int(raw.decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise BadRequest('Некорректный курсор')
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404
+
+
+def visible(resource, request):
+    queryset = resource.visible(request.user)
+    if queryset is None:
+        raise Forbidden('Нужно войти')
+    return queryset
+
+
+def selected_fields(resource, request):
+    names = request.GET.get('fields')
+    try:
+        return resource.select(names.split(',') if names else None)
+    except KeyError as error:
+        raise BadRequest(f'Неизвестное поле {error}')
+
+
+def filtered(resource, request, order):
+    queryset = visible(resource, request)
+    try:
+        return resource.filter(queryset, request.GET).order_by(order)
+    except ValueError:
+        raise BadRequest('Некорректный фильтр')
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def json_errors(view):
+    """Ошибки API отдаются в JSON, а не HTML-страницами сайта."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({'detail': str(error)}, status=400)
+        except Forbidden as error:
+            return JsonResponse({'detail': str(error)}, status=403)
+        except TooManyRequests as error:
+            return JsonResponse({'detail': str(error)}, status=429)
+        except Http404:
+            return JsonResponse({'detail': 'Не найдено'}, status=404)
+    return wrapper
+
+
+@require_GET
+@json_errors
+def resource_list(request, name):
+    """Страница ресурса от новых записей к старым, курсор по pk."""
+    resource = get_resource(name)
+    selected = selected_fields(resource, request)
+    limit = get_limit(request)
+    queryset = filtered(resource, request, '-pk')
+    if 'after' in request.GET:
+        queryset = queryset.filter(pk__lt=decode_cursor(request.GET['after']))
+    # pk нужен для курсора, даже если клиент его не запрашивал
+    with_pk = {**selected, 'pk': 'pk'}
+    rows = list(resource.values(queryset, with_pk)[:limit + 1])
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    return JsonResponse({
+        'results': [resource.convert(row, selected) for row in rows],
+        'next': encode_cursor(rows[-1]['pk']) if has_next else None,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@require_GET
+@json_errors
+def resource_detail(request, name, pk):
+    resource = get_resource(name)
+    selected = selected_fields(resource, request)
+    queryset = visible(resource, request).filter(pk=pk)
+    row = resource.values(queryset, selected).first()
+    if row is None:
+        raise Http404
+    return JsonResponse(
+        resource.convert(row, selected),
+        json_dumps_params={'ensure_ascii': False})
+
+
+def export_client(request):
+    """Кому разрешена выгрузка: сотруднику или по токену API_EXPORT_TOKEN."""
+    token = settings.API_EXPORT_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and constant_time_compare(header, f'Token {token}'):
+        return 'token'
+    if request.user.is_authenticated and request.user.is_staff:
+        return f'user:{request.user.pk}'
+    raise Forbidden('Выгрузка доступна сотрудникам и по токену')
+
+
+def check_export_rate(client):
+    """Не больше API_EXPORT_LIMIT выгрузок за API_EXPORT_PERIOD секунд.
+
+    Счетчик в кэше: с общим кэшем (SHARED_CACHE) лимит общий для всех
+    процессов, иначе он действует в каждом процессе отдельно.
+    """
+    key = f'api:export:{client}'
+    cache.add(key, 0, settings.API_EXPORT_PERIOD)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Счетчик успел истечь между add и incr
+        cache.set(key, 1, settings.API_EXPORT_PERIOD)
+        count = 1
+    if count > settings.API_EXPORT_LIMIT:
+        raise TooManyRequests('Слишком много выгрузок, попробуйте позже')
+
+
+@require_GET
+@json_errors
+def resource_export(request, name):
+    """Все записи ресурса в NDJSON, потоком и без накопления в памяти."""
+    check_export_rate(export_client(request))
+    resource = get_resource(name)
+    selected = selected_fields(resource, request)
+    queryset = filtered(resource, request, 'pk')
+    # Строки читаются уже после выхода из view: базу выбираем сейчас
+    values = resource.values(queryset.using(queryset.db), selected).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE)
+    lines = (
+        json.dumps(
+            resource.convert(row, selected),
+            cls=DjangoJSONEncoder, ensure_ascii=False,
+        ) + '\n'
+        for row in values
+    )
+    response = StreamingHttpResponse(
+        lines, content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}.ndjson"'
+    return response
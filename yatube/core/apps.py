@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import auth
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite)
+        post_save.connect(auth.forget, sender=get_user_model())
+        post_delete.connect(auth.forget, sender=get_user_model())
@@ -0,0 +1,43 @@
+"""Бэкенд аутентификации с кэшем пользователя.
+
+AuthenticationMiddleware на каждом запросе заново читает строку
+пользователя. Бэкенд держит ее значения в кэше Django
+AUTH_USER_CACHE_SECONDS секунд и на каждый запрос собирает из них новый
+объект, чтобы запросы не делили изменяемое состояние. Сохранение или
+удаление пользователя удаляет запись из кэша. Без общего кэша
+(SHARED_CACHE) другие процессы этого не увидят, поэтому там кэш
+по умолчанию выключен: смена пароля и выход из сессий должны
+действовать сразу.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+
+def cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget(sender, instance, **kwargs):
+    cache.delete(cache_key(instance.pk))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        timeout = settings.AUTH_USER_CACHE_SECONDS
+        if not timeout:
+            return super().get_user(user_id)
+        model = get_user_model()
+        cached = cache.get(cache_key(user_id))
+        if cached is not None:
+            names, values = cached
+            user = model.from_db(router.db_for_read(model), names, values)
+            return user if self.user_can_authenticate(user) else None
+        user = super().get_user(user_id)
+        if user is not None:
+            names = [field.attname for field in model._meta.concrete_fields]
+            values = [getattr(user, name) for name in names]
+            cache.set(cache_key(user_id), (names, values), timeout)
+        return user
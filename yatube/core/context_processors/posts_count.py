@@ -0,0 +1,11 @@
+from functools import partial
+
+from posts import counters
+
+
+def posts_count(request):
+    """Добавляет число постов на сайте для шапки."""
+    if hasattr(request, 'posts_count'):
+        # Уже прочитано при проверке ETag, см. posts.freshness
+        return {'posts_count': request.posts_count}
+    return {'posts_count': partial(counters.get, counters.TOTAL_POSTS)}
@@ -0,0 +1,26 @@
+"""Настройка соединений SQLite.
+
+Каждое новое соединение получает прагмы из settings.SQLITE_PRAGMAS:
+журнал WAL, чтобы читатели не ждали писателей, и ожидание блокировки
+вместо немедленной ошибки database is locked.
+"""
+from django.conf import settings
+from django.db import connections
+
+# Служебные запросы transaction.atomic, их не считают в бенчмарках
+SAVEPOINTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if connection.alias in settings.DATABASE_REPLICAS:
+            cursor.execute('PRAGMA query_only = 1')
+
+
+def close_connections():
+    # Соединения с базой не переживают fork, каждый процесс открывает свое
+    connections.close_all()
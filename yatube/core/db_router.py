@@ -0,0 +1,61 @@
+"""Чтение с реплик.
+
+Чтения во view из settings.REPLICA_VIEWS уходят на случайную реплику
+из settings.DATABASE_REPLICAS, все остальное идет в default. После
+записи чтения этого запроса, а благодаря ReplicaMiddleware и следующих
+запросов клиента в течение REPLICA_STICKY_SECONDS, снова идут в
+default: автор сразу видит свой пост или комментарий.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+# Только что созданная сессия может еще не доехать до реплики
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def start(pinned=False):
+    """Начало запроса; pinned - клиент недавно писал и читает с default."""
+    _state.replicas = False
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def allow_replicas():
+    _state.replicas = True
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+def reading_from_replica():
+    return bool(
+        settings.DATABASE_REPLICAS
+        and getattr(_state, 'replicas', False)
+        and not getattr(_state, 'pinned', False)
+        and not wrote()
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (reading_from_replica()
+                and model._meta.app_label not in PRIMARY_APPS):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default, объекты из них связываются свободно
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
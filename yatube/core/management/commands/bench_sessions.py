@@ -0,0 +1,105 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.db import SAVEPOINTS
+from posts.models import User
+
+from .bench_sqlite import quantile_ms
+
+# Режим -> (хранилище сессий, бэкенды аутентификации); db - как было.
+# Кэш пользователя в бэкенде включается на время замера
+MODES = {
+    'db': (
+        'django.contrib.sessions.backends.db',
+        ['django.contrib.auth.backends.ModelBackend'],
+    ),
+    'cached_db': (
+        'django.contrib.sessions.backends.cached_db',
+        ['core.auth.CachedModelBackend'],
+    ),
+    'signed_cookies': (
+        'django.contrib.sessions.backends.signed_cookies',
+        ['core.auth.CachedModelBackend'],
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность ленты подписок и профиля '
+        'у вошедших пользователей при разных хранилищах сессий'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=50,
+            help='Сколько пользователей одновременно держат сессии')
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Число запросов на каждый режим')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        users = list(User.objects.order_by('pk')[:options['users']])
+        authors = list(User.objects.annotate(
+            posts_count=Count('posts')).filter(
+            posts_count__gt=0).values_list('username', flat=True)[:100])
+        if not (users and authors):
+            raise CommandError(
+                'Нужны пользователи и посты, сначала выполните '
+                'generate_dataset')
+        self.stdout.write(
+            f'{"режим":15} {"запросов/с":>11} {"p50, мс":>8} '
+            f'{"p99, мс":>8} {"запросов к базе":>16}')
+        for mode, (engine, backends) in MODES.items():
+            with override_settings(
+                    DEBUG=False, SESSION_ENGINE=engine,
+                    AUTHENTICATION_BACKENDS=backends,
+                    AUTH_USER_CACHE_SECONDS=30):
+                self.run_mode(mode, users, authors, options)
+
+    def run_mode(self, mode, users, authors, options):
+        cache.clear()
+        rng = random.Random(options['seed'])
+        # Клиенты создаются внутри режима: middleware читает настройки
+        # сессий при первом запросе
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        paths = [reverse('posts:follow_index')] + [
+            reverse('posts:profile', args=[username])
+            for username in authors
+        ]
+        for client in clients:
+            client.get(paths[0])
+        latencies, queries = [], [0]
+
+        def count_query(execute, sql, params, many, context):
+            if not sql.startswith(SAVEPOINTS):
+                queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            total_started = time.perf_counter()
+            for number in range(options['requests']):
+                client = rng.choice(clients)
+                path = paths[0] if number % 2 else rng.choice(paths[1:])
+                started = time.perf_counter()
+                client.get(path)
+                latencies.append(time.perf_counter() - started)
+            elapsed = time.perf_counter() - total_started
+        self.stdout.write(
+            f'{mode:15} {len(latencies) / elapsed:11.0f} '
+            f'{quantile_ms(latencies, 50):8.1f} '
+            f'{quantile_ms(latencies, 99):8.1f} '
+            f'{queries[0] / len(latencies):16.1f}')
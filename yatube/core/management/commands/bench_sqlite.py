@@ -0,0 +1,133 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core.db import close_connections
+from posts.models import Post, User
+from posts.utils import POSTS_LIMIT
+
+# Как база работала до настройки: журнал отката и прагмы по умолчанию
+MODES = {
+    'default': ('delete', {}),
+    'tuned': ('wal', settings.SQLITE_PRAGMAS),
+}
+
+
+def read(last_pk, rng):
+    list(Post.objects.for_feed()[:POSTS_LIMIT])
+    Post.objects.for_detail().filter(pk=rng.randint(1, last_pk)).first()
+
+
+def write(author_id, rng):
+    with transaction.atomic():
+        Post.objects.create(
+            author_id=author_id, text=f'Нагрузочный пост {rng.random()}')
+
+
+def work(job):
+    """Крутит чтения или записи до дедлайна, возвращает задержки."""
+    role, path, pragmas, deadline, seed = job
+    connections['default'].settings_dict['NAME'] = path
+    settings.SQLITE_PRAGMAS = pragmas
+    rng = random.Random(seed)
+    last_pk = Post.objects.order_by('-pk').values_list('pk', flat=True)[0]
+    author_id = User.objects.values_list('pk', flat=True)[0]
+    latencies, errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'reader':
+                read(last_pk, rng)
+            else:
+                write(author_id, rng)
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    close_connections()
+    return role, latencies, errors
+
+
+def quantile_ms(values, percent):
+    if len(values) < 2:
+        return 0
+    return statistics.quantiles(values, n=100)[percent - 1] * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность чтения SQLite при активных '
+        'писателях: журнал отката без прагм против WAL с SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность прогона каждого режима, секунд')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан только на SQLite')
+        if not Post.objects.exists():
+            raise CommandError(
+                'Нужны посты, сначала выполните generate_dataset')
+        self.stdout.write(
+            f'{"режим":8} {"чтений/с":>9} {"p50, мс":>8} {"p99, мс":>8} '
+            f'{"записей/с":>10} {"p99, мс":>8} {"ошибки":>7}')
+        for mode, (journal, pragmas) in MODES.items():
+            path = self.copy_database(journal)
+            try:
+                self.run_mode(mode, path, pragmas, options)
+            finally:
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+
+    def copy_database(self, journal):
+        """Копия базы через backup API рядом с рабочей, на том же диске."""
+        source_path = settings.DATABASES['default']['NAME']
+        descriptor, path = tempfile.mkstemp(
+            suffix='.sqlite3', dir=os.path.dirname(source_path))
+        os.close(descriptor)
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+            target.execute(f'PRAGMA journal_mode = {journal}')
+        finally:
+            source.close()
+            target.close()
+        return path
+
+    def run_mode(self, mode, path, pragmas, options):
+        roles = (
+            ['reader'] * options['readers'] + ['writer'] * options['writers'])
+        close_connections()
+        with Pool(len(roles), initializer=close_connections) as pool:
+            # Дедлайн общий, чтобы писатели мешали читателям все время
+            deadline = time.monotonic() + options['duration'] + 1
+            results = pool.map(work, [
+                (role, path, pragmas, deadline, f'{options["seed"]}:{number}')
+                for number, role in enumerate(roles)
+            ])
+        reads, writes, errors = [], [], 0
+        for role, latencies, failed in results:
+            (reads if role == 'reader' else writes).extend(latencies)
+            errors += failed
+        duration = options['duration']
+        self.stdout.write(
+            f'{mode:8} {len(reads) / duration:9.0f} '
+            f'{quantile_ms(reads, 50):8.1f} {quantile_ms(reads, 99):8.1f} '
+            f'{len(writes) / duration:10.0f} '
+            f'{quantile_ms(writes, 99):8.1f} {errors:7}')
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core import metrics, template_cache
+from posts.models import Follow, Post
+
+# Режим -> загрузчики шаблонов; plain - как при DEBUG = True
+MODES = {
+    'plain': settings.TEMPLATE_LOADERS,
+    'cached': [
+        ('django.template.loaders.cached.Loader', settings.TEMPLATE_LOADERS),
+    ],
+}
+
+
+def templates_with(loaders):
+    engine = settings.TEMPLATES[0]
+    return [{**engine, 'OPTIONS': {**engine['OPTIONS'], 'loaders': loaders}}]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера шаблонов основных страниц без кэша '
+        'шаблонов и с кэширующим загрузчиком после прогрева'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Число запросов к каждой странице в каждом режиме')
+
+    def handle(self, *args, **options):
+        post = Post.objects.filter(
+            group__isnull=False).order_by('-comments_count').first()
+        follow = Follow.objects.select_related('user').first()
+        if post is None or follow is None:
+            raise CommandError(
+                'Нужны посты в группах и подписки, сначала выполните '
+                'generate_dataset')
+        paths = {
+            'posts:main_page': reverse('posts:main_page'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[post.group.slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[post.author.username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[post.id]),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        results = {}
+        for mode, loaders in MODES.items():
+            with override_settings(
+                    DEBUG=False, TEMPLATES=templates_with(loaders)):
+                results[mode] = self.run_mode(
+                    mode, paths, follow.user, options['requests'])
+        self.stdout.write(
+            f'{"страница":20} {"plain, мс":>10} {"cached, мс":>11} '
+            f'{"ускорение":>10}')
+        for view in paths:
+            plain, cached = results['plain'][view], results['cached'][view]
+            self.stdout.write(
+                f'{view:20} {plain * 1000:10.2f} {cached * 1000:11.2f} '
+                f'{plain / cached if cached else 0:9.1f}x')
+
+    def run_mode(self, mode, paths, user, count):
+        if mode == 'cached':
+            timings = template_cache.warm_up()
+            self.stdout.write(
+                f'Прогрев: {len(timings)} шаблонов за '
+                f'{sum(timings.values()) * 1000:.0f} мс')
+        client = Client()
+        client.force_login(user)
+        metrics.registry.clear()
+        for view, path in paths.items():
+            for _ in range(count):
+                # Иначе фрагменты лент берутся из кэша без рендера
+                cache.clear()
+                client.get(path)
+        means = {}
+        for view in paths:
+            histogram = metrics.registry.histogram(
+                'yatube_template_seconds', view)
+            means[view] = histogram.sum / histogram.count
+        return means
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу default в файлы реплик из DATABASE_REPLICAS '
+        'через backup API SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every', type=float,
+            help='Повторять копирование каждые N секунд')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены, задайте YATUBE_REPLICAS')
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                self.copy(alias)
+            self.stdout.write(
+                f'Реплики обновлены за {time.perf_counter() - started:.2f} с')
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def copy(self, alias):
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+        try:
+            # Копия согласована: backup видит базу на один момент времени
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
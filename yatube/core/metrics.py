@@ -0,0 +1,179 @@
+"""Легкие метрики запросов для продакшена.
+
+Данные копятся в гистограммах в памяти процесса и отдаются страницей
+/metrics/ в текстовом формате Prometheus.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from time import perf_counter
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import MemcachedCache
+from django.template.backends.django import DjangoTemplates
+
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+_MISSING = object()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Пары (le, накопленное число наблюдений)."""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = defaultdict(int)
+
+    def observe(self, name, buckets, view, value):
+        with self._lock:
+            histogram = self._histograms.setdefault(
+                (name, view), Histogram(buckets))
+            histogram.observe(value)
+
+    def histogram(self, name, view):
+        with self._lock:
+            return self._histograms.get((name, view))
+
+    def increment(self, name, labels, value=1):
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, view), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} histogram')
+                    typed.add(name)
+                for bound, total in histogram.samples():
+                    lines.append(
+                        f'{name}_bucket{{view="{view}",le="{bound}"}} {total}')
+                lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+                lines.append(
+                    f'{name}_count{{view="{view}"}} {histogram.count}')
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                rendered = ','.join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f'{name}{{{rendered}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+_state = threading.local()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def start_request():
+    _state.stats = RequestStats()
+    return _state.stats
+
+
+def finish_request():
+    _state.stats = None
+
+
+def current():
+    """Статистика текущего запроса или None вне запроса."""
+    return getattr(_state, 'stats', None)
+
+
+def record_cache(hits, misses):
+    stats = current()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class InstrumentedCacheMixin:
+    """Считает попадания и промахи кэша в текущем запросе."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            record_cache(0, 1)
+            return default
+        record_cache(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version)
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+class InstrumentedMemcachedCache(InstrumentedCacheMixin, MemcachedCache):
+    pass
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None:
+            return self._wrapped.render(context, request)
+        # Вложенные рендеры уже входят во время внешнего шаблона
+        stats.template_depth += 1
+        started = perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, который замеряет время рендера."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,117 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter, time
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class MetricsMiddleware:
+    """Собирает время, запросы к базе, рендер и кэш по имени view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.start_request()
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.count_query))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        self.record(view, stats, perf_counter() - started)
+        self.check_budget(view, stats)
+        return response
+
+    def count_query(self, execute, sql, params, many, context):
+        stats = metrics.current()
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if stats is not None:
+                stats.queries += 1
+                stats.db_time += perf_counter() - started
+
+    def record(self, view, stats, elapsed):
+        registry = metrics.registry
+        seconds = metrics.SECONDS_BUCKETS
+        registry.observe('yatube_request_seconds', seconds, view, elapsed)
+        registry.observe('yatube_db_seconds', seconds, view, stats.db_time)
+        registry.observe(
+            'yatube_template_seconds', seconds, view, stats.template_time)
+        registry.observe(
+            'yatube_db_queries', metrics.QUERIES_BUCKETS, view, stats.queries)
+        for result, value in (
+            ('hit', stats.cache_hits), ('miss', stats.cache_misses)
+        ):
+            registry.increment(
+                'yatube_cache_requests_total',
+                (('view', view), ('result', result)),
+                value,
+            )
+
+    def check_budget(self, view, stats):
+        budget = settings.VIEW_QUERY_BUDGETS.get(view)
+        if budget is None or stats.queries <= budget:
+            return
+        message = (
+            f'{view}: {stats.queries} запросов к базе при бюджете {budget}')
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик и держит автора записи на default."""
+
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.start(pinned=self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.wrote()
+            db_router.start()
+        if wrote:
+            self.pin(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name
+                in settings.REPLICA_VIEWS):
+            # Пользователь запроса читается с default, пока реплики
+            # еще не разрешены: иначе свежий вход выглядел бы выходом.
+            request.user.is_authenticated
+            db_router.allow_replicas()
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES[self.cookie_name]) > time()
+        except (KeyError, ValueError):
+            return False
+
+    def pin(self, response):
+        seconds = settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            self.cookie_name, str(int(time() + seconds)), max_age=seconds,
+            httponly=True, samesite='Lax')
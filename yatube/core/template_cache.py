@@ -0,0 +1,33 @@
+"""Прогрев кэша шаблонов.
+
+С кэширующим загрузчиком шаблон разбирается при первом обращении, и
+первые запросы каждого процесса платят за разбор всех включаемых
+шаблонов. warm_up() разбирает шаблоны проекта заранее, при старте.
+"""
+import os
+from time import perf_counter
+
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(('.html', '.txt')):
+                path = os.path.relpath(os.path.join(root, name), directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_up():
+    """Компилирует шаблоны из DIRS; вернет словарь имя -> секунды."""
+    timings = {}
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.engine.dirs:
+            for name in sorted(template_names(directory)):
+                started = perf_counter()
+                engine.get_template(name)
+                timings[name] = perf_counter() - started
+    return timings
@@ -0,0 +1,242 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from posts.models import Post
+
+from . import db_router, template_cache
+from .auth import CachedModelBackend
+from .db_router import ReplicaRouter
+from .metrics import InstrumentedMemcachedCache, registry
+from .middleware import QueryBudgetExceeded, ReplicaMiddleware
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+        self.client = Client()
+
+    def test_metrics_are_collected_per_view(self):
+        """Метрики страницы попадают в гистограммы по имени view"""
+        self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:main_page'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        for line in (
+            'yatube_request_seconds_count{view="posts:main_page"} 2',
+            'yatube_db_queries_count{view="posts:main_page"} 2',
+            'yatube_template_seconds_count{view="posts:main_page"} 2',
+            'yatube_cache_requests_total'
+            '{view="posts:main_page",result="hit"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, body)
+
+    def test_metrics_are_hidden_from_outside(self):
+        """Метрики доступны только с внутренних адресов"""
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_CLIENT_IP_HEADER='HTTP_X_REAL_IP')
+    def test_metrics_behind_proxy_check_client_address(self):
+        """За прокси проверяется адрес клиента из заголовка прокси"""
+        response = self.client.get(
+            reverse('metrics'),
+            REMOTE_ADDR='127.0.0.1', HTTP_X_REAL_IP='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            reverse('metrics'),
+            REMOTE_ADDR='10.0.0.2', HTTP_X_REAL_IP='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        VIEW_QUERY_BUDGETS={'posts:main_page': 1}, QUERY_BUDGET_STRICT=True)
+    def test_strict_budget_fails(self):
+        """Превышение бюджета запросов в строгом режиме — ошибка"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:main_page'))
+
+    @override_settings(VIEW_QUERY_BUDGETS={'posts:main_page': 1})
+    def test_budget_is_logged(self):
+        """По умолчанию превышение бюджета только пишется в лог"""
+        with self.assertLogs('core.middleware', level='WARNING'):
+            self.client.get(reverse('posts:main_page'))
+
+    def test_memcached_backend_has_client_library(self):
+        """Для общего кэша установлен клиент memcached из requirements"""
+        backend = InstrumentedMemcachedCache('127.0.0.1:11211', {})
+        self.assertEqual(type(backend._cache).__module__, 'memcache')
+
+
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_applied_to_connection(self):
+        """Прагмы из настроек применяются к соединению с базой"""
+        expected = {
+            'synchronous': 1,
+            'busy_timeout': settings.SQLITE_PRAGMAS['busy_timeout'],
+            'cache_size': settings.SQLITE_PRAGMAS['cache_size'],
+            'temp_store': 2,
+        }
+        with connection.cursor() as cursor:
+            for name, value in expected.items():
+                with self.subTest(pragma=name):
+                    cursor.execute(f'PRAGMA {name}')
+                    self.assertEqual(cursor.fetchone()[0], value)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TestCase):
+    """Маршрутизация проверяется без обращений к базе реплики."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.router = ReplicaRouter()
+        cls.factory = RequestFactory()
+
+    def route(self, path, method='get', write=False, cookies=None):
+        """Прогоняет запрос через middleware, возвращает базу и ответ."""
+        request = getattr(self.factory, method)(path)
+        request.COOKIES.update(cookies or {})
+        request.user = AnonymousUser()
+        request.resolver_match = resolve(path)
+        routed = {}
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if write:
+                self.router.db_for_write(Post)
+            routed['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        response = middleware(request)
+        return routed['db'], response
+
+    def test_read_only_views_use_replica(self):
+        """Чтения страниц из REPLICA_VIEWS идут на реплику"""
+        self.assertEqual(self.route(reverse('posts:main_page'))[0], 'replica')
+
+    def test_other_views_use_primary(self):
+        """Остальные страницы и запросы POST читают с default"""
+        for path, method in (
+            (reverse('posts:post_create'), 'get'),
+            (reverse('posts:main_page'), 'post'),
+        ):
+            with self.subTest(path=path, method=method):
+                self.assertEqual(self.route(path, method)[0], 'default')
+
+    def test_sessions_always_use_primary(self):
+        """Сессии читаются с default даже на страницах для реплик"""
+        db_router.start()
+        db_router.allow_replicas()
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        db_router.start()
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент какое-то время читает только с default"""
+        db, response = self.route(reverse('posts:main_page'), write=True)
+        self.assertEqual(db, 'default')
+        cookie = response.cookies[ReplicaMiddleware.cookie_name]
+        self.assertEqual(
+            cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        db, _ = self.route(
+            reverse('posts:main_page'),
+            cookies={ReplicaMiddleware.cookie_name: cookie.value})
+        self.assertEqual(db, 'default')
+
+    def test_expired_pin_returns_to_replica(self):
+        """Просроченная метка записи снова пускает на реплику"""
+        db, response = self.route(
+            reverse('posts:main_page'),
+            cookies={ReplicaMiddleware.cookie_name: '1'})
+        self.assertEqual(db, 'replica')
+        self.assertNotIn(ReplicaMiddleware.cookie_name, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Без реплик все чтения идут в default"""
+        self.assertEqual(self.route(reverse('posts:main_page'))[0], 'default')
+
+
+@override_settings(AUTH_USER_CACHE_SECONDS=30)
+class SessionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.backend = CachedModelBackend()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_user_skips_database(self):
+        """Повторное чтение пользователя не ходит в базу"""
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+        self.assertEqual(user.username, self.user.username)
+        self.assertIsNot(user, self.backend.get_user(self.user.pk))
+
+    def test_save_invalidates_cached_user(self):
+        """Сохранение пользователя сбрасывает его запись в кэше"""
+        self.backend.get_user(self.user.pk)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.save()
+        self.assertEqual(
+            self.backend.get_user(self.user.pk).first_name, 'Новое')
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=0)
+    def test_cache_can_be_disabled(self):
+        """С нулевым сроком пользователь читается каждый раз"""
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            self.backend.get_user(self.user.pk)
+
+    def test_session_engines(self):
+        """Вошедший пользователь видит ленту при любом хранилище сессий"""
+        for engine in settings.SESSION_ENGINES.values():
+            with self.subTest(engine=engine), \
+                    override_settings(SESSION_ENGINE=engine):
+                client = Client()
+                client.force_login(self.user)
+                response = client.get(reverse('posts:follow_index'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['user'], self.user)
+
+
+@override_settings(TEMPLATES=[{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [(
+            'django.template.loaders.cached.Loader',
+            settings.TEMPLATE_LOADERS,
+        )],
+    },
+}])
+class TemplateCacheTest(TestCase):
+    def test_warm_up_compiles_project_templates(self):
+        """Прогрев кладет в кэш загрузчика все шаблоны проекта"""
+        timings = template_cache.warm_up()
+        names = set(template_cache.template_names(settings.TEMPLATES_DIR))
+        self.assertEqual(set(timings), names)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('includes/card_post.html', loader.get_template_cache)
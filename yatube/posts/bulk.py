@@ -0,0 +1,146 @@
+"""Массовая загрузка данных в обход сигналов моделей.
+
+bulk_create не отправляет post_save, поэтому после загрузки счетчики,
+ленты подписок и кэш лент нужно привести в порядок через refresh().
+"""
+from contextlib import contextmanager
+from itertools import islice
+
+from django.db import connection, models, transaction
+
+from . import caching, counters, images, search, timeline, trending
+from .models import Post, ThumbnailJob, TimelineEntry
+
+BATCH_SIZE: int = 5000
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, objects, batch_size=BATCH_SIZE, **options):
+    """Пишет объекты пачками, каждую в своей транзакции; вернет число."""
+    total = 0
+    for batch in chunks(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **options)
+        total += len(batch)
+    return total
+
+
+def insert_rows(model, fields, rows, batch_size=BATCH_SIZE,
+                ignore_conflicts=False):
+    """Как insert(), но из кортежей значений через executemany.
+
+    Не создает модели и не собирает SQL на каждую пачку, поэтому
+    в разы быстрее на миллионах строк. Даты приводятся к виду базы
+    так же, как при save(), остальные значения передаются как есть.
+    """
+    fields = [model._meta.get_field(name) for name in fields]
+    prepare = [
+        field.get_db_prep_save if isinstance(field, models.DateField)
+        else None
+        for field in fields
+    ]
+    quote = connection.ops.quote_name
+    sql = '{insert} {table} ({columns}) VALUES ({values})'.format(
+        insert=connection.ops.insert_statement(ignore_conflicts),
+        table=quote(model._meta.db_table),
+        columns=', '.join(quote(field.column) for field in fields),
+        values=', '.join(['%s'] * len(fields)),
+    )
+    total = 0
+    for batch in chunks(rows, batch_size):
+        params = [
+            [
+                value if function is None else function(value, connection)
+                for function, value in zip(prepare, row)
+            ]
+            for row in batch
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        total += len(batch)
+    return total
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать даты полям auto_now_add при bulk_create."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+SECONDARY_INDEXES_SQL = """
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND tbl_name = %s
+        AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%%'
+"""
+
+
+def _secondary_indexes(model):
+    """Неуникальные индексы таблицы, включая индексы внешних ключей.
+
+    Уникальные индексы остаются: на них держится INSERT OR IGNORE.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(SECONDARY_INDEXES_SQL, [model._meta.db_table])
+        return cursor.fetchall()
+
+
+@contextmanager
+def deferred_indexes(*models):
+    """Снимает вторичные индексы и поиск на время загрузки.
+
+    Построить индекс один раз по готовой таблице быстрее, чем
+    обновлять его на каждой вставленной строке.
+    """
+    indexes = [
+        index for model in models for index in _secondary_indexes(model)]
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    with_search = Post in models and search.is_supported()
+    if with_search:
+        with connection.cursor() as cursor:
+            search.uninstall(cursor)
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            if with_search:
+                search.install(cursor)
+
+
+def enqueue_thumbnails(batch_size=BATCH_SIZE):
+    images = Post.objects.exclude(image='').values_list('image', flat=True)
+    insert(
+        ThumbnailJob,
+        (ThumbnailJob(image=name) for name in images.iterator()),
+        batch_size, ignore_conflicts=True,
+    )
+
+
+def refresh():
+    """Пересчитывает все, что обычно поддерживают сигналы."""
+    counters.recount()
+    with deferred_indexes(TimelineEntry):
+        timeline.rebuild()
+    trending.rebuild()
+    images.recount()
+    enqueue_thumbnails()
+    caching.bump(caching.POSTS, caching.USERS, caching.GROUPS)
@@ -0,0 +1,133 @@
+"""Версионированные ключи кэша лент.
+
+Каждая область (все посты, группа, автор, подписки читателя) имеет номер
+версии в кэше. Сигналы увеличивают версию при изменении данных, и ключи
+фрагментов со старой версией больше не читаются. Версии всех лент
+(USERS, GROUPS) меняются, только когда меняются имена авторов и
+названия групп, видные в карточках.
+
+Версия, поднятая в одном процессе, видна другим только через общий
+кэш (settings.SHARED_CACHE); без него фрагменты и карточки хранятся
+недолго, см. FEED_CACHE_TIMEOUT. Поэтому bump увеличивает еще и
+счетчик области в базе (см. counter_name) в той же транзакции, что и
+изменение: по нему строятся ETag (см. freshness), и ответ 304 не
+зависит от того, какой процесс принял запрос.
+
+Карточки постов кэшируются еще и по отдельности: ключ карточки включает
+время изменения поста, поэтому после сброса фрагмента ленты заново
+рисуются только новые и измененные посты.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import get_template
+
+from core import db_router
+
+from . import counters
+
+POSTS = 'posts'
+USERS = 'users'
+GROUPS = 'groups'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def follows_scope(user_id):
+    return f'follows:{user_id}'
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def counter_name(scope):
+    """Счетчик Counter с версией области в базе."""
+    return f'version:{scope}'
+
+
+def versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Начальная версия от времени, чтобы после вытеснения счетчика
+            # из кэша не совпасть со старыми фрагментами.
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        counters.add(counter_name(scope), 1)
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def set_on_commit(key, value, timeout):
+    """Кладет прочитанное из базы в кэш, только если транзакция удастся.
+
+    Иначе после отката в кэше надолго остались бы незафиксированные
+    данные под уже действующей версией.
+    """
+    transaction.on_commit(lambda: cache.set(key, value, timeout))
+
+
+def feed_cache(request, *scopes):
+    """Контекст для {% cache feed_timeout feed feed_key %} в лентах."""
+    viewer = 'user' if request.user.is_authenticated else 'guest'
+    parts = versions(USERS, GROUPS, *scopes)
+    # Реплика может отставать: ее фрагменты хранятся отдельно и недолго,
+    # чтобы автор, читающий с default, не получил устаревший фрагмент.
+    replica = db_router.reading_from_replica()
+    key = ':'.join([
+        *scopes, *map(str, parts), viewer,
+        'replica' if replica else 'primary', request.GET.urlencode(),
+    ])
+    return {
+        'feed_key': key,
+        'feed_timeout': (
+            settings.REPLICA_CACHE_TIMEOUT if replica
+            else settings.FEED_CACHE_TIMEOUT),
+    }
+
+
+def card_key(post, users, groups, replica):
+    return ':'.join([
+        'card', str(post.pk), str(post.updated.timestamp()),
+        str(users), str(groups), 'replica' if replica else 'primary',
+    ])
+
+
+def render_cards(posts):
+    """HTML карточек постов: кэш читается одним get_many."""
+    posts = list(posts)
+    replica = db_router.reading_from_replica()
+    users, groups = versions(USERS, GROUPS)
+    keys = [card_key(post, users, groups, replica) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: post for post, key in zip(posts, keys) if key not in cards}
+    if missing:
+        template = get_template('includes/card_post.html')
+        rendered = {
+            key: template.render({'post': post})
+            for key, post in missing.items()
+        }
+        cache.set_many(rendered, (
+            settings.REPLICA_CACHE_TIMEOUT if replica
+            else settings.CARD_CACHE_TIMEOUT))
+        cards.update(rendered)
+    return [cards[key] for key in keys]
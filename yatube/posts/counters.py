@@ -0,0 +1,99 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики обновляются сигналами (каждый обработчик сигнала выполняется
+в своей транзакции) и читаются одним запросом. Команда recount_stats
+пересчитывает их целиком.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Counter, Follow, Post, User, UserStats
+
+TOTAL_POSTS = 'posts'
+
+
+def group_posts(group_id):
+    return f'group:{group_id}:posts'
+
+
+def get(name):
+    value = Counter.objects.filter(
+        name=name).values_list('value', flat=True).first()
+    return value or 0
+
+
+def get_many(*names):
+    """Значения счетчиков одним запросом, в порядке имен."""
+    values = dict(Counter.objects.filter(
+        name__in=names).values_list('name', 'value'))
+    return [values.get(name, 0) for name in names]
+
+
+@transaction.atomic(savepoint=False)
+def add(name, delta):
+    if not Counter.objects.filter(name=name).update(value=F('value') + delta):
+        Counter.objects.get_or_create(name=name)
+        Counter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+@transaction.atomic(savepoint=False)
+def change_stats(user_id, **deltas):
+    # Строка статистики создается вместе с пользователем; при каскадном
+    # удалении пользователя ее уже может не быть, и это не ошибка.
+    changes = {field: F(field) + delta for field, delta in deltas.items()}
+    UserStats.objects.filter(user_id=user_id).update(**changes)
+
+
+@transaction.atomic(savepoint=False)
+def change_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def _count(model, field, outer='user_id'):
+    rows = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+@transaction.atomic
+def recount():
+    """Пересчитывает все счетчики по данным в базе."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True).values_list('id', flat=True)
+        ],
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author'),
+        comments_count=_count(Comment, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    Post.objects.update(comments_count=_count(Comment, 'post', 'pk'))
+    per_group = Post.objects.filter(group__isnull=False).order_by().values(
+        'group').annotate(total=Count('id')).values_list('group', 'total')
+    totals = {TOTAL_POSTS: Post.objects.count()}
+    totals.update(
+        (group_posts(group_id), total) for group_id, total in per_group)
+    # Строки обновляются на месте: читатели не увидят пустую таблицу,
+    # а счетчики групп, где постов не осталось, становятся нулями
+    Counter.objects.filter(
+        name__startswith='group:', name__endswith=':posts',
+    ).exclude(name__in=totals).update(value=0)
+    existing = set(Counter.objects.filter(
+        name__in=totals).values_list('name', flat=True))
+    for name in existing:
+        Counter.objects.filter(name=name).update(value=totals[name])
+    Counter.objects.bulk_create(
+        [
+            Counter(name=name, value=value)
+            for name, value in totals.items() if name not in existing
+        ],
+        batch_size=500,
+    )
@@ -0,0 +1,73 @@
+"""Кэш подписок читателя.
+
+Множество id авторов, на которых подписан пользователь, читается из базы
+один раз и хранится в кэше под версией области подписок читателя
+(caching.follows_scope), которую сигналы увеличивают при подписке и
+отписке. Проверка «подписан ли я на X» сводится к поиску в множестве.
+
+Подписка выполняется одним INSERT: уникальность пары обеспечивает
+база, поэтому повторы и одновременные запросы не создают дублей и не
+меняют счетчики дважды. Отписка тоже начинается с записи: DELETE без
+предварительного SELECT ждет блокировку SQLite по busy_timeout, а
+счетчики и лента меняются, только если строку удалил именно он.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from core import db_router
+
+from . import caching, signals
+from .models import Follow
+
+
+def ids(user):
+    """frozenset id авторов, на которых подписан пользователь."""
+    if not user.is_authenticated:
+        return frozenset()
+    version, = caching.versions(caching.follows_scope(user.pk))
+    key = f'following:{user.pk}:{version}'
+    found = cache.get(key)
+    if found is None:
+        # Реплика может не знать о только что оформленной подписке,
+        # а в кэш множество попадает надолго
+        found = frozenset(
+            Follow.objects.using(db_router.PRIMARY).filter(
+                user_id=user.pk).values_list('author_id', flat=True))
+        caching.set_on_commit(key, found, settings.FOLLOWING_CACHE_TIMEOUT)
+    return found
+
+
+def is_following(user, author_id):
+    return author_id in ids(user)
+
+
+def states(user, author_ids):
+    """Словарь id автора -> подписан ли пользователь, для кнопок."""
+    followed = ids(user)
+    return {author_id: author_id in followed for author_id in author_ids}
+
+
+def follow(user, author):
+    """Подписывает; вернет False, если подписка уже была."""
+    if user.pk == author.pk:
+        return False
+    try:
+        with transaction.atomic():
+            Follow.objects.create(user=user, author=author)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unfollow(user, author):
+    """Отписывает; вернет число удаленных подписок, 0 - если ее не было."""
+    using = db_router.PRIMARY
+    with transaction.atomic(using=using):
+        # Без сборщика удаления: он сначала читает строку, и второй
+        # писатель SQLite получил бы database is locked вместо ожидания
+        deleted = Follow.objects.filter(
+            user=user, author=author)._raw_delete(using)
+        if deleted == 1:
+            signals.follow_removed(user.pk, author.pk)
+    return deleted
@@ -0,0 +1,79 @@
+"""ETag для условных GET лент и страницы поста.
+
+ETag собирается из версий областей, от которых зависит страница (их
+счетчики в базе поднимает caching.bump), числа постов в шапке и того,
+кто на нее смотрит. Версии и число постов читаются одним запросом, так
+что ETag одинаков во всех процессах, а неизменившаяся страница
+отвечает 304 без выборки ленты и рендера шаблона.
+"""
+import hashlib
+
+from . import caching, counters
+from .models import Group, Post, User
+
+
+def _etag(request, scopes, *parts):
+    viewer, csrf = 'guest', ''
+    if request.user.is_authenticated:
+        viewer = request.user.pk
+        # Формы на страницах только у вошедших. После входа секрет CSRF
+        # другой, и страница из кэша браузера не должна отправлять формы
+        # со старым токеном. Пока cookie нет, ее выдаст первый же ответ
+        # 200, и следующий запрос получит уже другой ETag.
+        csrf = request.META.get('CSRF_COOKIE', '')
+    # Шапка страницы покажет это же число, не читая его второй раз
+    request.posts_count, *versions = counters.get_many(
+        counters.TOTAL_POSTS, *map(caching.counter_name, scopes))
+    raw = ':'.join(map(str, [
+        *parts, *versions, request.posts_count, viewer, csrf,
+        request.GET.urlencode(),
+    ]))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _follows(request):
+    if request.user.is_authenticated:
+        return [caching.follows_scope(request.user.pk)]
+    return []
+
+
+def index_etag(request):
+    return _etag(request, [caching.POSTS, caching.USERS, caching.GROUPS])
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug).values_list('id', flat=True).first()
+    if group_id is None:
+        return None
+    return _etag(request, [
+        caching.USERS, caching.GROUPS, caching.group_scope(group_id),
+    ], group_id)
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(
+        username=username).values_list('id', flat=True).first()
+    if author_id is None:
+        return None
+    return _etag(request, [
+        caching.USERS, caching.GROUPS, caching.author_scope(author_id),
+        *_follows(request),
+    ], author_id)
+
+
+def post_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'updated', 'author_id', 'comments_count').first()
+    if post is None:
+        return None
+    return _etag(request, [
+        caching.USERS, caching.GROUPS,
+        caching.author_scope(post['author_id']),
+    ], post_id, post['updated'].timestamp(), post['comments_count'])
+
+
+def follow_etag(request):
+    return _etag(request, [
+        caching.POSTS, caching.USERS, caching.GROUPS, *_follows(request),
+    ])
@@ -0,0 +1,86 @@
+"""Счетчики ссылок на картинки постов и сборка мусора.
+
+Сигналы Post увеличивают счетчик StoredImage новой картинки и уменьшают
+у старой. Файл без ссылок удаляется не сразу: между сохранением файла в
+хранилище и сохранением поста проходит время, и та же картинка могла
+как раз загружаться снова. Команда collect_media удаляет файлы, у
+которых ссылок нет дольше MEDIA_GC_GRACE секунд, вместе с миниатюрами.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from sorl.thumbnail import default
+
+from . import thumbnails
+from .models import Post, StoredImage, ThumbnailJob
+
+BATCH_SIZE: int = 500
+
+
+def acquire(name):
+    changes = {'refs': F('refs') + 1, 'released': None}
+    if not StoredImage.objects.filter(name=name).update(**changes):
+        StoredImage.objects.get_or_create(name=name)
+        StoredImage.objects.filter(name=name).update(**changes)
+
+
+def release(name):
+    StoredImage.objects.filter(name=name, refs__gt=0).update(
+        refs=F('refs') - 1)
+    StoredImage.objects.filter(
+        name=name, refs=0, released__isnull=True,
+    ).update(released=timezone.now())
+
+
+def forget(name):
+    """Удаляет файл картинки, ее миниатюры и задачу очереди."""
+    image = thumbnails.source(name)
+    # kvstore sorl удаляет и файлы миниатюр этой картинки
+    default.kvstore.delete(image)
+    image.delete()
+    ThumbnailJob.objects.filter(image=name).delete()
+
+
+def collect(grace=None):
+    """Удаляет картинки без ссылок старше grace секунд; вернет их число."""
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE
+    moment = timezone.now() - timedelta(seconds=grace)
+    names = StoredImage.objects.filter(
+        refs=0, released__lte=moment).values_list('name', flat=True)
+    storage = Post._meta.get_field('image').storage
+    collected = 0
+    for name in list(names):
+        # Тот же файл только что загрузили снова, а пост еще не сохранен
+        if (storage.exists(name)
+                and storage.get_modified_time(name) > moment):
+            continue
+        # Ссылка могла появиться заново, пока шла сборка
+        with transaction.atomic():
+            if not StoredImage.objects.filter(name=name, refs=0).delete()[0]:
+                continue
+            forget(name)
+        collected += 1
+    return collected
+
+
+@transaction.atomic
+def recount():
+    """Пересчитывает ссылки по постам, например после массовой загрузки."""
+    names = Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True).distinct()
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=name) for name in names.iterator()),
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+    refs = Post.objects.filter(
+        image=OuterRef('name')
+    ).order_by().values('image').annotate(total=Count('pk')).values('total')
+    StoredImage.objects.update(refs=Coalesce(
+        Subquery(refs, output_field=IntegerField()), 0))
+    StoredImage.objects.filter(refs__gt=0).update(released=None)
+    StoredImage.objects.filter(
+        refs=0, released__isnull=True).update(released=timezone.now())
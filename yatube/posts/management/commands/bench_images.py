@@ -0,0 +1,172 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from PIL import Image, ImageDraw, ImageFilter
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+from posts.templatetags.post_thumbnails import CARD_SIZES
+from posts.utils import POSTS_LIMIT
+
+# Сколько карточек видно сразу; остальные картинки с loading="lazy"
+# браузер загрузит, только когда до них дойдет прокрутка
+FIRST_SCREEN = 2
+# Ширина экрана в CSS-пикселях и плотность пикселей
+SCREENS = (
+    ('телефон', 360, 2),
+    ('большой телефон', 414, 3),
+    ('планшет', 768, 2),
+    ('ноутбук', 1366, 1),
+    ('монитор 4K', 1920, 2),
+)
+
+
+def slot_width(screen):
+    """Ширина картинки карточки на экране, как в CARD_SIZES."""
+    return 1110 if screen >= 1200 else screen
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает объем картинок одной страницы ленты до и после '
+        'адаптивных вариантов (одна миниатюра 960x339 против srcset)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--images', type=int, default=POSTS_LIMIT,
+            help='Картинок на странице ленты')
+        parser.add_argument(
+            '--size', default='2400x1600',
+            help='Размер исходных фотографий')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--dataset', action='store_true',
+            help='Взять картинки постов из базы вместо сгенерированных')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'sizes карточки: {CARD_SIZES}')
+        # Картинки читаются до подмены MEDIA_ROOT, а миниатюры рисуются
+        # во временном каталоге и не трогают настоящие
+        originals = self.dataset(options) if options['dataset'] else None
+        root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=root):
+                sizes = self.render(options, originals)
+                self.report(sizes)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def dataset(self, options):
+        """Пары (имя, байты) первых картинок постов из базы."""
+        names = list(Post.objects.exclude(image='').order_by(
+            'image').values_list('image', flat=True).distinct()[
+            :options['images']])
+        if not names:
+            raise CommandError(
+                'В базе нет постов с картинками: generate_dataset '
+                'создает посты без них, загрузите картинки или '
+                'запустите команду без --dataset')
+        storage = Post._meta.get_field('image').storage
+        originals = []
+        for name in names:
+            with storage.open(name) as file:
+                originals.append((name, file.read()))
+        return originals
+
+    def photo(self, rng, size):
+        """Похожая на фото картинка: градиент, пятна и зерно."""
+        width, height = size
+        image = Image.linear_gradient('L').resize(size).convert('RGB')
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            left, top = rng.randrange(width), rng.randrange(height)
+            radius = rng.randint(width // 40, width // 6)
+            draw.ellipse(
+                (left - radius, top - radius, left + radius, top + radius),
+                fill=tuple(rng.randrange(256) for _ in range(3)))
+        image = image.filter(ImageFilter.GaussianBlur(width // 200))
+        noise = Image.effect_noise(size, 24).convert('RGB')
+        return Image.blend(image, noise, 0.15)
+
+    def generated(self, options):
+        """Пары (имя, байты) похожих на фото картинок."""
+        rng = random.Random(options['seed'])
+        size = tuple(map(int, options['size'].split('x')))
+        for number in range(options['images']):
+            with tempfile.SpooledTemporaryFile() as raw:
+                self.photo(rng, size).save(raw, 'JPEG', quality=90)
+                raw.seek(0)
+                yield f'photo_{number}.jpg', raw.read()
+
+    def render(self, options, originals=None):
+        """Рисует все варианты; вернет размеры файлов по вариантам."""
+        sizes = []
+        started = time.perf_counter()
+        for number, (original, content) in enumerate(
+                originals or self.generated(options)):
+            path = os.path.join(
+                'bench', f'{number}_{os.path.basename(original)}')
+            name = default.storage.save(path, ContentFile(content))
+            source = thumbnails.source_size(
+                ImageFile(name, default.storage))
+            variants = {}
+            geometry, card = settings.POST_THUMBNAILS['card']
+            variants['card'] = self.file_size(name, geometry, card)
+            for image_format in thumbnails.image_formats():
+                for width, (geometry, variant) in (
+                        thumbnails.responsive_variants(
+                            image_format, source)):
+                    variants[image_format, width] = self.file_size(
+                        name, geometry, variant)
+            sizes.append(variants)
+            # Временные миниатюры не должны остаться в kvstore sorl
+            default.kvstore.delete(ImageFile(name, default.storage))
+        self.stdout.write(
+            f'Варианты {len(sizes)} картинок: '
+            f'{time.perf_counter() - started:.1f} с')
+        return sizes
+
+    def file_size(self, name, geometry, options):
+        thumbnail = thumbnails.backend.get_thumbnail(
+            name, geometry, **options)
+        return default.storage.size(thumbnail.name)
+
+    def pick(self, variants, needed):
+        """Вариант, который выберет браузер: первый формат, не уже нужного.
+
+        Если исходник уже самой малой ширины srcset, остается карточка.
+        """
+        image_format = thumbnails.image_formats()[0]
+        widths = sorted(
+            width for kind, width in
+            (key for key in variants if key != 'card')
+            if kind == image_format)
+        if not widths:
+            return variants['card']
+        width = next(
+            (width for width in widths if width >= needed), widths[-1])
+        return variants[image_format, width]
+
+    def report(self, sizes):
+        self.stdout.write(
+            f'{"экран":<18}{"до, КБ":>9}{"после, КБ":>11}{"экономия":>10}'
+            f'{"первый экран, КБ":>18}')
+        before = sum(variants['card'] for variants in sizes)
+        for title, screen, density in SCREENS:
+            needed = slot_width(screen) * density
+            picked = [self.pick(variants, needed) for variants in sizes]
+            after = sum(picked)
+            self.stdout.write(
+                f'{title:<18}{before / 1024:>9.0f}{after / 1024:>11.0f}'
+                f'{1 - after / before:>10.0%}'
+                f'{sum(picked[:FIRST_SCREEN]) / 1024:>18.0f}')
@@ -0,0 +1,114 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from faker import Faker
+
+from posts.search import (
+    COUNT_SQL, FTS_SCHEMA, FTS_TABLE, RANKED_SQL, to_match)
+
+BATCH_SIZE = 10000
+VOCABULARY_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск LIKE и FTS5 на сгенерированном корпусе постов '
+        'во временной базе SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--keep', help='Сохранить базу с корпусом по этому пути')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        Faker.seed(options['seed'])
+        path = options['keep'] or tempfile.mktemp(suffix='.sqlite3')
+        db = sqlite3.connect(path)
+        try:
+            vocabulary = self.generate(db, options['posts'])
+            self.report(db, vocabulary, options['repeat'])
+        finally:
+            db.close()
+            if not options['keep']:
+                os.remove(path)
+
+    def generate(self, db, total):
+        fake = Faker('ru_RU')
+        vocabulary = list({fake.word() for _ in range(VOCABULARY_SIZE)})
+        # Частоты слов по закону Ципфа, как в живых текстах
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        db.execute(
+            'CREATE TABLE posts_post (id INTEGER PRIMARY KEY, text TEXT)')
+        started = time.perf_counter()
+        for offset in range(0, total, BATCH_SIZE):
+            rows = [
+                (' '.join(random.choices(
+                    vocabulary, weights, k=random.randint(5, 60))),)
+                for _ in range(min(BATCH_SIZE, total - offset))
+            ]
+            db.executemany('INSERT INTO posts_post (text) VALUES (?)', rows)
+        db.commit()
+        self.stdout.write(
+            f'Корпус: {total} постов за '
+            f'{time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        for statement in FTS_SCHEMA:
+            db.execute(statement)
+        db.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        db.commit()
+        self.stdout.write(
+            f'Индекс FTS5: {time.perf_counter() - started:.1f} с')
+        return vocabulary
+
+    def measure(self, db, sql, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, db, vocabulary, repeat):
+        queries = {
+            'частое слово': vocabulary[0],
+            'среднее слово': vocabulary[len(vocabulary) // 100],
+            'редкое слово': vocabulary[-1],
+            'два слова': f'{vocabulary[1]} {vocabulary[50]}',
+        }
+        like_page = (
+            'SELECT id FROM posts_post WHERE text LIKE ? '
+            'ORDER BY id DESC LIMIT 10')
+        # Оба подсчета, как count_matches, останавливаются на окне
+        # ранжирования + 1: больше страница поиска не показывает
+        like_count = (
+            'SELECT COUNT(*) FROM (SELECT id FROM posts_post '
+            'WHERE text LIKE ? ORDER BY id DESC LIMIT ?)')
+        fts_page = RANKED_SQL.replace('%s', '?') + ' LIMIT 10'
+        fts_count = COUNT_SQL.replace('%s', '?')
+        cap = settings.SEARCH_RANK_WINDOW + 1
+        self.stdout.write(f'COUNT считает не больше {cap} совпадений')
+        self.stdout.write(
+            f'{"запрос":<16}{"LIKE стр.":>12}{"LIKE COUNT":>12}'
+            f'{"FTS стр.":>12}{"FTS COUNT":>12}  (медиана, мс)')
+        for title, query in queries.items():
+            like = [f'%{query}%']
+            match = [to_match(query)]
+            ranked = [*match, settings.SEARCH_RANK_WINDOW]
+            self.stdout.write(
+                f'{title:<16}'
+                f'{self.measure(db, like_page, like, repeat):>12.1f}'
+                f'{self.measure(db, like_count, [*like, cap], repeat):>12.1f}'
+                f'{self.measure(db, fts_page, ranked, repeat):>12.1f}'
+                f'{self.measure(db, fts_count, [*match, cap], repeat):>12.1f}'
+            )
@@ -0,0 +1,168 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.trending import RANK_SQL, WINDOWS, hour_of, rank_params
+
+BATCH_SIZE = 10000
+SCHEMA = (
+    'CREATE TABLE posts_post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'pub_date DATETIME)',
+    'CREATE INDEX post_author_pub_date_idx '
+    'ON posts_post (author_id, pub_date DESC, id DESC)',
+    'CREATE TABLE posts_postactivity (id INTEGER PRIMARY KEY, '
+    'post_id INTEGER, hour DATETIME, comments INTEGER)',
+    'CREATE UNIQUE INDEX unique_post_activity '
+    'ON posts_postactivity (post_id, hour)',
+    'CREATE INDEX post_activity_hour_idx ON posts_postactivity (hour)',
+    'CREATE TABLE posts_authoractivity (id INTEGER PRIMARY KEY, '
+    'author_id INTEGER, hour DATETIME, follows INTEGER)',
+    'CREATE UNIQUE INDEX unique_author_activity '
+    'ON posts_authoractivity (author_id, hour)',
+    'CREATE INDEX author_activity_hour_idx ON posts_authoractivity (hour)',
+    'CREATE TABLE posts_comment (id INTEGER PRIMARY KEY, '
+    'post_id INTEGER, created DATETIME)',
+)
+# Так рейтинг считался бы без корзин: группировкой самих комментариев
+SCAN_SQL = (
+    'SELECT post_id FROM posts_comment WHERE created >= ? '
+    'GROUP BY post_id ORDER BY COUNT(*) DESC, post_id DESC LIMIT ?')
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пересчет рейтингов популярных постов по часовым '
+        'корзинам во временной базе SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--comments', type=int, default=20_000_000)
+        parser.add_argument('--follows', type=int, default=1_000_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=100_000)
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='За сколько последних дней распределить комментарии; '
+                 'по умолчанию все попадают в самое длинное окно')
+        parser.add_argument(
+            '--scan', action='store_true',
+            help='Записать и сами комментарии, чтобы сравнить с '
+                 'группировкой posts_comment')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.now = datetime.utcnow()
+        path = tempfile.mktemp(suffix='.sqlite3')
+        db = sqlite3.connect(path)
+        try:
+            for statement in SCHEMA:
+                db.execute(statement)
+            self.generate(db, options)
+            self.report(db, options)
+        finally:
+            db.close()
+            os.remove(path)
+
+    def popular(self, total):
+        """Случайный id от 1, где первые встречаются намного чаще."""
+        return min(int(self.random.paretovariate(1.2)), total)
+
+    def moment(self, days):
+        return self.now - timedelta(
+            seconds=self.random.randint(0, days * 86400))
+
+    def generate(self, db, options):
+        started = time.perf_counter()
+        # Посты опубликованы за то же время, что и комментарии: свежие
+        # посты авторов с новыми подписчиками тоже попадают в кандидаты
+        db.executemany('INSERT INTO posts_post VALUES (?, ?, ?)', (
+            (
+                post_id, self.random.randint(1, options['authors']),
+                str(self.moment(options['days'])),
+            )
+            for post_id in range(1, options['posts'] + 1)
+        ))
+        # Корзины собираются так же, как их копят сигналы: по одному
+        # событию на комментарий или подписку
+        comments, follows = Counter(), Counter()
+        for number in range(0, options['comments'], BATCH_SIZE):
+            batch = [
+                (self.popular(options['posts']), self.moment(options['days']))
+                for _ in range(min(BATCH_SIZE, options['comments'] - number))
+            ]
+            comments.update(
+                (post_id, str(hour_of(moment))) for post_id, moment in batch)
+            if options['scan']:
+                db.executemany(
+                    'INSERT INTO posts_comment (post_id, created) '
+                    'VALUES (?, ?)',
+                    [(post_id, str(moment)) for post_id, moment in batch])
+        follows.update(
+            (
+                self.popular(options['authors']),
+                str(hour_of(self.moment(options['days']))),
+            )
+            for _ in range(options['follows'])
+        )
+        db.executemany(
+            'INSERT INTO posts_postactivity (post_id, hour, comments) '
+            'VALUES (?, ?, ?)',
+            ((*key, total) for key, total in comments.items()))
+        db.executemany(
+            'INSERT INTO posts_authoractivity (author_id, hour, follows) '
+            'VALUES (?, ?, ?)',
+            ((*key, total) for key, total in follows.items()))
+        if options['scan']:
+            db.execute(
+                'CREATE INDEX comment_created_idx '
+                'ON posts_comment (created)')
+        db.commit()
+        self.stdout.write(
+            f'Данные: {options["comments"]} комментариев в '
+            f'{len(comments)} корзинах постов и {len(follows)} корзинах '
+            f'авторов за {time.perf_counter() - started:.1f} с')
+
+    def measure(self, db, sql, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, db, options):
+        ranked = RANK_SQL.format(
+            post_activity='posts_postactivity',
+            author_activity='posts_authoractivity',
+            post='posts_post',
+        ).replace('%s', '?')
+        limit = settings.TRENDING_LIMIT
+        weight = settings.TRENDING_FOLLOW_WEIGHT
+        header = f'{"окно":<6}{"корзины, мс":>14}'
+        if options['scan']:
+            header += f'{"posts_comment, мс":>20}'
+        self.stdout.write(f'{header}  (медиана)')
+        total = 0
+        for window, length in WINDOWS.items():
+            start = str(hour_of(self.now - length))
+            timing = self.measure(
+                db, ranked, rank_params(start, weight, limit),
+                options['repeat'])
+            total += timing
+            line = f'{window:<6}{timing:>14.1f}'
+            if options['scan']:
+                scan = self.measure(
+                    db, SCAN_SQL, [start, limit], options['repeat'])
+                line += f'{scan:>20.1f}'
+            self.stdout.write(line)
+        self.stdout.write(f'Все окна: {total / 1000:.2f} с')
@@ -0,0 +1,301 @@
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.db import SAVEPOINTS, close_connections
+from posts.models import Group, Post, User
+
+NAMESPACES = ('posts', 'users', 'about')
+# Страницы, которые без входа только перенаправляют на логин
+LOGIN_REQUIRED = {
+    'posts:post_create', 'posts:post_edit', 'posts:add_comment',
+    'posts:follow_index', 'posts:profile_follow', 'posts:profile_unfollow',
+}
+# Страницы с пагинацией: номер страницы выбирается случайно
+PAGINATED = {
+    'posts:main_page', 'posts:group_list', 'posts:profile',
+    'posts:follow_index', 'posts:search',
+}
+# После этих запросов клиент разлогинивается, ему нужна новая сессия
+LOGS_OUT = {'users:logout'}
+SAMPLE_SIZE = 1000
+
+
+def routes():
+    """Имена всех маршрутов posts, users и about."""
+    resolver = get_resolver()
+    names = []
+    for namespace in NAMESPACES:
+        _, sub_resolver = resolver.namespace_dict[namespace]
+        for pattern in sub_resolver.url_patterns:
+            if isinstance(pattern, URLPattern) and pattern.name:
+                names.append(f'{namespace}:{pattern.name}')
+    return names
+
+
+def quantile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Sampler:
+    """Случайные, но воспроизводимые параметры запросов."""
+
+    def __init__(self, seed, auth_share, mean_page):
+        self.random = random.Random(seed)
+        self.auth_share = auth_share
+        self.mean_page = mean_page
+        self.users = list(User.objects.order_by('?').values_list(
+            'pk', 'username')[:SAMPLE_SIZE])
+        self.groups = list(Group.objects.order_by('?').values_list(
+            'slug', flat=True)[:SAMPLE_SIZE])
+        self.posts = list(Post.objects.order_by('?').values_list(
+            'pk', 'text')[:SAMPLE_SIZE])
+        if not (self.users and self.groups and self.posts):
+            raise CommandError(
+                'База пуста, сначала выполните generate_dataset')
+
+    def popular(self, items):
+        index = int(self.random.paretovariate(1.2)) - 1
+        return items[min(index, len(items) - 1)]
+
+    def kwargs(self, name):
+        pk, username = self.popular(self.users)
+        if name.startswith('users:password_reset_confirm'):
+            user = User.objects.get(pk=pk)
+            return {
+                'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+                'token': default_token_generator.make_token(user),
+            }
+        return {
+            'username': username,
+            'slug': self.popular(self.groups),
+            'post_id': self.popular(self.posts)[0],
+        }
+
+    def query(self, name):
+        params = {}
+        if name == 'posts:search':
+            params['q'] = self.random.choice(
+                self.random.choice(self.posts)[1].split() or ['пост'])
+        if name in PAGINATED:
+            # Почти все читают первые страницы, до глубоких доходят единицы
+            params['page'] = 1 + int(
+                self.random.expovariate(1 / self.mean_page))
+        return params
+
+    def user_id(self, name):
+        if name in LOGIN_REQUIRED or self.random.random() < self.auth_share:
+            return self.popular(self.users)[0]
+        return None
+
+    def path(self, name):
+        parameters = self.parameters(name)
+        if not parameters:
+            return reverse(name)
+        kwargs = self.kwargs(name)
+        return reverse(name, kwargs={
+            key: kwargs[key] for key in parameters})
+
+    @staticmethod
+    def parameters(name):
+        namespace, url_name = name.split(':')
+        _, sub_resolver = get_resolver().namespace_dict[namespace]
+        for pattern in sub_resolver.url_patterns:
+            if getattr(pattern, 'name', None) == url_name:
+                return set(pattern.pattern.converters)
+        return set()
+
+
+class Clients:
+    """Клиенты с уже созданными сессиями, по одному на пользователя."""
+
+    def __init__(self):
+        self.clients = {None: Client()}
+        self.users = {}
+
+    def get(self, name, user_id):
+        if name in LOGS_OUT:
+            return self.login(Client(), user_id)
+        if user_id not in self.clients:
+            self.clients[user_id] = self.login(Client(), user_id)
+        return self.clients[user_id]
+
+    def login(self, client, user_id):
+        if user_id is not None:
+            # Нужна настоящая строка: хэш сессии считается по паролю,
+            # и с пустым пользователем следующий запрос был бы анонимным
+            if user_id not in self.users:
+                self.users[user_id] = User.objects.get(pk=user_id)
+            client.force_login(self.users[user_id])
+        return client
+
+
+def run(job):
+    """Выполняет запросы к одному маршруту и возвращает замеры."""
+    name, count, seed, auth_share, mean_page = job
+    sampler = Sampler(seed, auth_share, mean_page)
+    clients = Clients()
+    latencies, queries, errors = [], [], Counter()
+    counter = {'queries': 0}
+
+    def count_query(execute, sql, params, many, context):
+        if not sql.startswith(SAVEPOINTS):
+            counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    with override_settings(DEBUG=False):
+        for _ in range(count):
+            client = clients.get(name, sampler.user_id(name))
+            path = sampler.path(name)
+            params = sampler.query(name)
+            counter['queries'] = 0
+            # Запросы фиксируют свои изменения, как настоящие: иначе
+            # on_commit не наполнял бы кэш и теплый путь не измерялся
+            with connection.execute_wrapper(count_query):
+                started = time.perf_counter()
+                try:
+                    response = client.get(path, params)
+                    if response.status_code >= 500:
+                        errors[str(response.status_code)] += 1
+                except Exception as error:
+                    errors[f'{type(error).__name__}: {error}'] += 1
+                latencies.append(time.perf_counter() - started)
+            queries.append(counter['queries'])
+    return {
+        'route': name,
+        'requests': count,
+        'errors': sum(errors.values()),
+        'error_types': dict(errors),
+        'p50_ms': quantile(latencies, 50) * 1000,
+        'p95_ms': quantile(latencies, 95) * 1000,
+        'p99_ms': quantile(latencies, 99) * 1000,
+        'queries_mean': statistics.mean(queries),
+        'queries_max': max(queries),
+        # Пик памяти процесса пула, в Linux в КБ; в отчете по процессам
+        'worker': os.getpid(),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех страниц posts, users и about: '
+        'задержки p50/p95/p99, запросы к базе и память процессов. '
+        'Запросы меняют данные (подписки, сессии), запускайте на копии '
+        'базы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число запросов к каждому маршруту')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов; на SQLite без WAL параллельные записи '
+                 'сессий заканчиваются ошибкой database is locked')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--auth-share', type=float, default=0.3,
+            help='Доля запросов от авторизованных пользователей')
+        parser.add_argument(
+            '--mean-page', type=float, default=1.5,
+            help='Средний номер запрашиваемой страницы')
+        parser.add_argument(
+            '--route', action='append',
+            help='Прогнать только этот маршрут, например posts:main_page')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        names = options['route'] or routes()
+        # На каждый маршрут свой seed: результат не зависит от их порядка
+        jobs = [
+            (name, options['requests'], f'{options["seed"]}:{name}',
+             options['auth_share'], options['mean_page'])
+            for name in names
+        ]
+        close_connections()
+        with Pool(options['workers'], initializer=close_connections) as pool:
+            results = pool.map(run, jobs)
+        report = {
+            'commit': current_commit(),
+            'options': {
+                key: options[key] for key in (
+                    'requests', 'seed', 'auth_share', 'mean_page')
+            },
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'groups': Group.objects.count(),
+            },
+            'routes': {result.pop('route'): result for result in results},
+            'workers': self.workers(results),
+        }
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)['routes']
+        self.print_report(report['routes'], baseline)
+        self.print_workers(report['workers'])
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def workers(results):
+        """Пиковая память каждого процесса пула, КБ."""
+        peaks = {}
+        for result in results:
+            worker = str(result.pop('worker'))
+            rss_kb = result.pop('max_rss_kb')
+            peaks[worker] = max(peaks.get(worker, 0), rss_kb)
+        return peaks
+
+    def print_workers(self, workers):
+        self.stdout.write(f'{"процесс":>10} {"RSS, МБ":>8}')
+        for worker, rss_kb in workers.items():
+            self.stdout.write(f'{worker:>10} {rss_kb / 1024:8.1f}')
+
+    def print_report(self, routes, baseline):
+        self.stdout.write(
+            f'{"маршрут":32} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"запросы":>8} {"ошибки":>7}')
+        for name, result in routes.items():
+            line = (
+                f'{name:32} {result["p50_ms"]:8.1f} {result["p95_ms"]:8.1f} '
+                f'{result["p99_ms"]:8.1f} {result["queries_mean"]:8.1f} '
+                f'{result["errors"]:7}'
+            )
+            old = (baseline or {}).get(name)
+            if old and old['p95_ms']:
+                change = result['p95_ms'] / old['p95_ms'] - 1
+                line += f'  p95 {change:+.0%}'
+            self.stdout.write(line)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые больше не ссылается ни один '
+        'пост, вместе с их миниатюрами; запускается по расписанию'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE,
+            help='Сколько секунд картинка без ссылок должна пролежать')
+
+    def handle(self, *args, **options):
+        collected = images.collect(options['grace'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено картинок: {collected}'))
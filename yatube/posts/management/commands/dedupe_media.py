@@ -0,0 +1,105 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+
+from posts import bulk, caching, images, thumbnails
+from posts.models import Post, ThumbnailJob
+from posts.storage import content_hash, hashed_name, is_hashed
+
+
+def link(source, target):
+    """Жесткая ссылка на тот же файл, а если нельзя — копия."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов, загруженные до хранилища по хешу, '
+        'под имена из хеша содержимого: одинаковые файлы остаются в '
+        'одном экземпляре, посты ссылаются на него'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать дубликаты, ничего не меняя')
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Удалить и файлы каталога картинок, на которые не '
+                 'ссылается ни один пост')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.dry_run = options['dry_run']
+        self.moved = self.duplicates = self.missing = self.freed = 0
+        self.seen = set()
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        for name in list(names.iterator()):
+            if not is_hashed(name):
+                self.rename(name)
+        orphans = self.orphans(options['delete_orphans'])
+        if not self.dry_run:
+            images.recount()
+            bulk.enqueue_thumbnails()
+            caching.bump(caching.POSTS, caching.USERS, caching.GROUPS)
+        self.stdout.write(
+            f'Перенесено: {self.moved}, дубликатов: {self.duplicates}, '
+            f'нет файла: {self.missing}, без ссылок: {orphans}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Освобождено: {self.freed / 1024 / 1024:.1f} МБ'))
+
+    def rename(self, name):
+        if not self.storage.exists(name):
+            self.missing += 1
+            return
+        with self.storage.open(name) as image:
+            target = hashed_name(name, content_hash(image))
+        if target in self.seen or self.storage.exists(target):
+            self.duplicates += 1
+            self.freed += self.storage.size(name)
+        else:
+            self.moved += 1
+        self.seen.add(target)
+        if self.dry_run:
+            return
+        if not self.storage.exists(target):
+            link(self.storage.path(name), self.storage.path(target))
+        # Новые миниатюры и карточки появятся уже для нового имени
+        with transaction.atomic():
+            Post.objects.filter(image=name).update(
+                image=target, updated=timezone.now())
+            ThumbnailJob.objects.filter(image=name).delete()
+        default.kvstore.delete(thumbnails.source(name))
+        self.storage.delete(name)
+
+    def orphans(self, delete):
+        """Файлы каталога upload_to, на которые не ссылаются посты."""
+        upload_to = Post._meta.get_field('image').upload_to
+        used = set(Post.objects.exclude(image='').values_list(
+            'image', flat=True).iterator())
+        # Свежий файл может принадлежать посту, который еще сохраняется
+        fresh = time.time() - settings.MEDIA_GC_GRACE
+        found = 0
+        for directory, _, files in os.walk(self.storage.path(upload_to)):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.storage.location)
+                if name in used or os.path.getmtime(path) > fresh:
+                    continue
+                found += 1
+                if delete and not self.dry_run:
+                    self.freed += os.path.getsize(path)
+                    default.kvstore.delete(thumbnails.source(name))
+                    self.storage.delete(name)
+        return found
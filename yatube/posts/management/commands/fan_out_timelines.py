@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает по лентам посты авторов, переставших быть '
+        'популярными, из очереди'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=10,
+            help='Сколько авторов забирать из очереди за раз')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться')
+        parser.add_argument(
+            '--sleep', type=float, default=5.0,
+            help='Пауза при пустой очереди, секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            done = timeline.process_queue(options['batch'])
+            if not done:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            self.stdout.write(f'Разложены посты {done} авторов')
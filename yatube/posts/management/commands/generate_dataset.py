@@ -0,0 +1,154 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from faker import Faker
+
+from posts import bulk
+from posts.models import Comment, Follow, Group, Post, User
+
+# Пул фраз: генерировать Faker-ом каждый из миллионов текстов слишком долго
+PHRASES = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает воспроизводимый набор данных для бенчмарков: '
+        'пользователей, группы, посты, комментарии и граф подписок '
+        'со степенным распределением'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=5_000_000)
+        parser.add_argument('--comments', type=int, default=20_000_000)
+        parser.add_argument(
+            '--follows', type=int, default=30,
+            help='Среднее число подписок на пользователя')
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределить даты публикаций')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        Faker.seed(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.phrases = [
+            self.fake.sentence(nb_words=12) for _ in range(PHRASES)]
+        self.now = timezone.now()
+        self.days = options['days']
+
+        users = self.step('Пользователи', self.create_users, options['users'])
+        groups = self.step('Группы', self.create_groups, options['groups'])
+        posts = self.step(
+            'Посты', self.create_posts, options['posts'], users, groups)
+        self.step(
+            'Комментарии', self.create_comments,
+            options['comments'], users, posts)
+        self.step('Подписки', self.create_follows, options['follows'], users)
+        self.step('Счетчики, ленты и очередь миниатюр', bulk.refresh)
+
+    def step(self, title, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(
+            f'{title}: {time.perf_counter() - started:.1f} с')
+        return result
+
+    def popular(self, ids):
+        """Случайный id, где первые элементы встречаются намного чаще."""
+        index = int(self.random.paretovariate(1.2)) - 1
+        return ids[min(index, len(ids) - 1)]
+
+    def moment(self):
+        return self.now - timedelta(
+            seconds=self.random.randint(0, self.days * 86400))
+
+    def created_ids(self, model, before):
+        return list(
+            model.objects.filter(pk__gt=before).values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def create_users(self, total):
+        before = self.last_pk(User)
+        password = make_password('benchmark')
+        bulk.insert(User, (
+            User(
+                username=f'bench_{before + number}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for number in range(total)
+        ))
+        ids = self.created_ids(User, before)
+        self.random.shuffle(ids)
+        return ids
+
+    def create_groups(self, total):
+        before = self.last_pk(Group)
+        bulk.insert(Group, (
+            Group(
+                title=self.fake.catch_phrase(),
+                slug=f'bench-{before + number}',
+                description=self.random.choice(self.phrases),
+            )
+            for number in range(total)
+        ))
+        return self.created_ids(Group, before)
+
+    def create_posts(self, total, users, groups):
+        before = self.last_pk(Post)
+        with bulk.explicit_dates(Post._meta.get_field('pub_date')):
+            bulk.insert(Post, (
+                Post(
+                    author_id=self.popular(users),
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.5 else None
+                    ),
+                    text=' '.join(self.random.choices(self.phrases, k=3)),
+                    pub_date=self.moment(),
+                )
+                for _ in range(total)
+            ))
+        ids = self.created_ids(Post, before)
+        self.random.shuffle(ids)
+        return ids
+
+    def create_comments(self, total, users, posts):
+        if not posts:
+            return
+        with bulk.explicit_dates(Comment._meta.get_field('created')):
+            bulk.insert(Comment, (
+                Comment(
+                    post_id=self.popular(posts),
+                    author_id=self.random.choice(users),
+                    text=self.random.choice(self.phrases),
+                    created=self.moment(),
+                )
+                for _ in range(total)
+            ))
+
+    def create_follows(self, average, users):
+        pairs = set()
+        for user_id in users:
+            wanted = min(
+                int(self.random.expovariate(1 / average)), len(users) - 1)
+            while wanted:
+                author_id = self.popular(users)
+                if author_id != user_id and (user_id, author_id) not in pairs:
+                    pairs.add((user_id, author_id))
+                wanted -= 1
+        bulk.insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинги популярных постов за час, сутки и неделю '
+        'и сохраняет их в базу; запускается по расписанию, например из '
+        'cron раз в несколько минут'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Сначала собрать корзины комментариев заново из базы')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            started = time.perf_counter()
+            trending.rebuild()
+            self.stdout.write(
+                f'Корзины: {time.perf_counter() - started:.1f} с')
+        started = time.perf_counter()
+        ranked = trending.refresh()
+        elapsed = time.perf_counter() - started
+        for window, ids in ranked.items():
+            self.stdout.write(f'{window}: {len(ids)} постов')
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинги пересчитаны за {elapsed:.2f} с'))
@@ -0,0 +1,46 @@
+import time
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+
+from core.db import close_connections
+from posts import bulk, thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры картинок постов из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Число процессов, которые рисуют миниатюры')
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Сколько задач забирать из очереди за раз')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться')
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза при пустой очереди, секунд')
+        parser.add_argument(
+            '--requeue', action='store_true',
+            help='Сначала поставить в очередь все картинки постов, '
+                 'например после изменения POST_IMAGE_WIDTHS')
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            bulk.enqueue_thumbnails()
+            thumbnails.requeue()
+        close_connections()
+        with Pool(options['workers'], initializer=close_connections) as pool:
+            while True:
+                jobs = thumbnails.claim(options['batch'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+                close_connections()
+                done = sum(pool.map(thumbnails.render, jobs))
+                self.stdout.write(f'Готово {done} из {len(jobs)}')
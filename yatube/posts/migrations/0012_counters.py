@@ -0,0 +1,77 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    Counter = apps.get_model('posts', 'Counter')
+
+    def totals(model, field):
+        return dict(
+            model.objects.order_by().values(field).annotate(
+                total=Count('id')).values_list(field, 'total')
+        )
+
+    posts = totals(Post, 'author')
+    comments = totals(Comment, 'author')
+    followers = totals(Follow, 'author')
+    following = totals(Follow, 'user')
+    UserStats.objects.bulk_create(
+        [
+            UserStats(
+                user_id=user_id,
+                posts_count=posts.get(user_id, 0),
+                comments_count=comments.get(user_id, 0),
+                followers_count=followers.get(user_id, 0),
+                following_count=following.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('id', flat=True)
+        ],
+        batch_size=500,
+    )
+    Counter.objects.bulk_create(
+        [Counter(name='posts', value=Post.objects.count())]
+        + [
+            Counter(name=f'group:{group_id}:posts', value=total)
+            for group_id, total in totals(Post, 'group').items()
+            if group_id is not None
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(help_text='Имя счетчика', max_length=100, primary_key=True, serialize=False)),
+                ('value', models.IntegerField(default=0, help_text='Значение')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Пользователь', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, help_text='Число постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, help_text='Число комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, help_text='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='Число подписок')),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(help_text='Путь к картинке', max_length=255, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Обрабатывается'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', help_text='Состояние', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Число попыток')),
+                ('enqueued', models.DateTimeField(default=django.utils.timezone.now, help_text='Время постановки в очередь')),
+            ],
+            options={
+                'ordering': ['enqueued'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='thumbnailjob',
+            index=models.Index(fields=['status', 'enqueued'], name='thumbnail_job_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:59
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def fill_post_activity(apps, schema_editor):
+    # Комментарии последней недели раскладываются по часам, как в
+    # posts.trending.rebuild; время старых подписок неизвестно
+    Comment = apps.get_model('posts', 'Comment')
+    PostActivity = apps.get_model('posts', 'PostActivity')
+    start = timezone.now().replace(
+        minute=0, second=0, microsecond=0) - timedelta(days=7)
+    hours = Comment.objects.filter(created__gte=start).annotate(
+        bucket=TruncHour('created')).order_by().values(
+        'post_id', 'bucket').annotate(total=Count('pk'))
+    PostActivity.objects.bulk_create(
+        (
+            PostActivity(
+                post_id=row['post_id'], hour=row['bucket'],
+                comments=row['total'])
+            for row in hours.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Начало часа')),
+                ('comments', models.IntegerField(default=0, help_text='Новых комментариев')),
+                ('post', models.ForeignKey(help_text='Пост', on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuthorActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(help_text='Начало часа')),
+                ('follows', models.IntegerField(default=0, help_text='Прирост подписчиков')),
+                ('author', models.ForeignKey(help_text='Автор', on_delete=django.db.models.deletion.CASCADE, related_name='activity', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='postactivity',
+            index=models.Index(fields=['hour'], name='post_activity_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='postactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='unique_post_activity'),
+        ),
+        migrations.AddIndex(
+            model_name='authoractivity',
+            index=models.Index(fields=['hour'], name='author_activity_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='authoractivity',
+            constraint=models.UniqueConstraint(fields=('author', 'hour'), name='unique_author_activity'),
+        ),
+        migrations.RunPython(
+            fill_post_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:14
+
+from django.db import migrations, models
+import posts.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_activity_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('name', models.CharField(help_text='Путь к картинке', max_length=255, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0, help_text='Число постов с картинкой')),
+                ('released', models.DateTimeField(blank=True, help_text='Когда ушла последняя ссылка', null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Картинка', storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        # Ссылки уже загруженных картинок, как в posts.images.recount
+        migrations.RunSQL(
+            'INSERT INTO posts_storedimage (name, refs) '
+            "SELECT image, COUNT(*) FROM posts_post WHERE image != '' "
+            'GROUP BY image',
+            migrations.RunSQL.noop,
+        ),
+    ]
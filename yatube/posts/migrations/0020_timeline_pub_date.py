@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_heavy_authors(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(heavy=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_help_texts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timelineentry',
+            name='pub_date',
+            field=models.DateTimeField(default=timezone.now, help_text='Время публикации поста'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            'UPDATE posts_timelineentry SET pub_date = ('
+            'SELECT pub_date FROM posts_post '
+            'WHERE posts_post.id = posts_timelineentry.post_id)',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='heavy',
+            field=models.BooleanField(default=False, help_text='Посты не раскладываются по лентам'),
+        ),
+        migrations.RunPython(mark_heavy_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_timeline_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thumbnailjob',
+            name='claimed',
+            field=models.DateTimeField(blank=True, help_text='Когда задачу забрал обработчик', null=True),
+        ),
+    ]
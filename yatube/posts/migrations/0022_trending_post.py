@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_thumbnailjob_claimed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(help_text='Окно рейтинга', max_length=8)),
+                ('rank', models.PositiveIntegerField(help_text='Место в рейтинге')),
+                ('post', models.ForeignKey(help_text='Пост', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='trendingpost',
+            constraint=models.UniqueConstraint(fields=('window', 'rank'), name='unique_trending_rank'),
+        ),
+    ]
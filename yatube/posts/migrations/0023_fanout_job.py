@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0022_trending_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FanoutJob',
+            fields=[
+                ('author', models.OneToOneField(help_text='Автор, переставший быть популярным', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('enqueued', models.DateTimeField(default=django.utils.timezone.now, help_text='Время постановки в очередь')),
+            ],
+            options={
+                'ordering': ['enqueued'],
+            },
+        ),
+    ]
@@ -1,8 +1,24 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 MAX_TEXT_LEN: int = 15
+# Поля, которые нужны карточке поста в лентах и на странице поста
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+    'group__title',
+)
 
 
 class Group(models.Model):
@@ -16,9 +32,22 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self, *fields):
+        """Посты со всем необходимым для карточки одним запросом."""
+        return self.select_related('author', 'group').only(
+            'author', 'group', *FEED_FIELDS, *fields)
+
+    def for_detail(self):
+        return self.for_feed('comments_count').annotate(
+            author_posts_count=F('author__stats__posts_count'))
+
+
 class Post(models.Model):
     text = models.TextField(help_text='Текст поста')
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(
+        auto_now=True, help_text='Время последнего изменения')
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -35,9 +64,27 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         help_text='Картинка'
     )
+    comments_count = models.PositiveIntegerField(
+        default=0, help_text='Число комментариев')
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:MAX_TEXT_LEN]
@@ -62,7 +109,12 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:MAX_TEXT_LEN]
@@ -82,5 +134,222 @@ class Follow(models.Model):
         help_text='Автор'
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
     def __str__(self):
         return 'Подписка'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        help_text='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        help_text='Пост'
+    )
+    # Копия Post.pub_date: лента читается по индексу без соединения
+    pub_date = models.DateTimeField(help_text='Время публикации поста')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return 'Запись ленты'
+
+
+class FanoutJob(models.Model):
+    """Автор, чьи посты заново раскладывает команда fan_out_timelines."""
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        help_text='Автор, переставший быть популярным'
+    )
+    enqueued = models.DateTimeField(
+        default=timezone.now, help_text='Время постановки в очередь')
+
+    class Meta:
+        ordering = ['enqueued']
+
+    def __str__(self):
+        return 'Раскладка ленты'
+
+
+class PostActivity(models.Model):
+    """Число новых комментариев к посту за час, см. posts.trending."""
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        help_text='Пост'
+    )
+    hour = models.DateTimeField(help_text='Начало часа')
+    comments = models.IntegerField(
+        default=0, help_text='Новых комментариев')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'hour'], name='unique_post_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='post_activity_hour_idx'),
+        ]
+
+    def __str__(self):
+        return 'Активность поста'
+
+
+class AuthorActivity(models.Model):
+    """Прирост подписчиков автора за час, см. posts.trending."""
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        help_text='Автор'
+    )
+    hour = models.DateTimeField(help_text='Начало часа')
+    follows = models.IntegerField(
+        default=0, help_text='Прирост подписчиков')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'hour'], name='unique_author_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='author_activity_hour_idx'),
+        ]
+
+    def __str__(self):
+        return 'Активность автора'
+
+
+class TrendingPost(models.Model):
+    """Место поста в рейтинге окна, его пересчитывает refresh_trending."""
+
+    window = models.CharField(max_length=8, help_text='Окно рейтинга')
+    rank = models.PositiveIntegerField(help_text='Место в рейтинге')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text='Пост'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['window', 'rank'], name='unique_trending_rank'),
+        ]
+
+    def __str__(self):
+        return 'Популярный пост'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        help_text='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, help_text='Число постов')
+    comments_count = models.PositiveIntegerField(
+        default=0, help_text='Число комментариев')
+    followers_count = models.PositiveIntegerField(
+        default=0, help_text='Число подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, help_text='Число подписок')
+    heavy = models.BooleanField(
+        default=False, help_text='Посты не раскладываются по лентам')
+
+    def __str__(self):
+        return 'Статистика пользователя'
+
+
+class Counter(models.Model):
+    name = models.CharField(
+        max_length=100, primary_key=True, help_text='Имя счетчика')
+    value = models.IntegerField(default=0, help_text='Значение')
+
+    def __str__(self):
+        return self.name
+
+
+class StoredImage(models.Model):
+    """Картинка в хранилище по хешу и число постов, которые на нее ссылаются.
+
+    Когда ссылок не остается, released запоминает время, и команда
+    collect_media удаляет файл и миниатюры по истечении MEDIA_GC_GRACE.
+    """
+
+    name = models.CharField(
+        max_length=255, primary_key=True, help_text='Путь к картинке')
+    refs = models.PositiveIntegerField(
+        default=0, help_text='Число постов с картинкой')
+    released = models.DateTimeField(
+        null=True, blank=True, help_text='Когда ушла последняя ссылка')
+
+    def __str__(self):
+        return self.name
+
+
+class ThumbnailJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    image = models.CharField(
+        max_length=255, unique=True, help_text='Путь к картинке')
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING,
+        help_text='Состояние')
+    attempts = models.PositiveSmallIntegerField(
+        default=0, help_text='Число попыток')
+    enqueued = models.DateTimeField(
+        default=timezone.now, help_text='Время постановки в очередь')
+    claimed = models.DateTimeField(
+        null=True, blank=True, help_text='Когда задачу забрал обработчик')
+
+    class Meta:
+        ordering = ['enqueued']
+        indexes = [
+            models.Index(
+                fields=['status', 'enqueued'],
+                name='thumbnail_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return self.image
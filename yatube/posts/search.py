@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts хранит только ссылки на строки posts_post
+(external content) и обновляется триггерами, поэтому видит и массовые
+операции, которые не вызывают сигналы Django.
+"""
+from django.conf import settings
+from django.db import connection, connections, router
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+FTS_SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='posts_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END""",
+)
+
+# bm25 считается только для самых новых совпадений: ранжирование всех
+# совпадений частого слова на миллионе постов занимает секунды.
+RANKED_SQL = (
+    f'SELECT rowid FROM ('
+    f'SELECT rowid, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s'
+    f') ORDER BY score, rowid DESC'
+)
+# Считаются совпадения того же окна, что и ранжируются, плюс одно:
+# по нему видно, что совпадений больше, чем показано
+COUNT_SQL = (
+    f'SELECT COUNT(*) FROM ('
+    f'SELECT rowid FROM {FTS_TABLE} '
+    f'WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s)'
+)
+
+
+def is_supported(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+def install(cursor):
+    """Создает индекс и триггеры, если их нет, и заполняет новый индекс."""
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+    exists = cursor.fetchone()
+    for statement in FTS_SCHEMA:
+        cursor.execute(statement)
+    if not exists:
+        rebuild(cursor)
+
+
+def rebuild(cursor):
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(cursor):
+    for name in ('insert', 'delete', 'update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{name}')
+    cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def to_match(query):
+    """Превращает ввод пользователя в запрос FTS5 из слов-фраз.
+
+    Каждое слово берется в кавычки, так что операторы FTS5 и знаки
+    препинания в запросе не ломают его разбор.
+    """
+    words = query.split()
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def matching_ids(query):
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [to_match(query)],
+    )
+
+
+def filter_posts(queryset, query):
+    """Оставляет посты, подходящие под запрос, без ранжирования."""
+    if not query.split():
+        return queryset.none()
+    if not is_supported():
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=matching_ids(query))
+
+
+def read_connection():
+    """Соединение, с которого читаются посты: реплика или default."""
+    return connections[router.db_for_read(Post)]
+
+
+def ranked_ids(query):
+    with read_connection().cursor() as cursor:
+        cursor.execute(
+            RANKED_SQL, [to_match(query), settings.SEARCH_RANK_WINDOW])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count_matches(query):
+    """Пара (число найденных постов, есть ли совпадения сверх окна).
+
+    Ранжируются и показываются только SEARCH_RANK_WINDOW самых новых
+    совпадений, поэтому и считаются только они.
+    """
+    if not query.split() or not is_supported():
+        return filter_posts(Post.objects.all(), query).count(), False
+    window = settings.SEARCH_RANK_WINDOW
+    with read_connection().cursor() as cursor:
+        cursor.execute(COUNT_SQL, [to_match(query), window + 1])
+        total = cursor.fetchone()[0]
+    return min(total, window), total > window
+
+
+def search_posts(query):
+    """Посты по запросу, самые релевантные первыми."""
+    posts = Post.objects.for_feed()
+    if not query.split() or not is_supported():
+        return filter_posts(posts, query)
+    ids = ranked_ids(query)
+    position = Case(
+        *[When(pk=pk, then=number) for number, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return posts.filter(pk__in=ids).order_by(position)
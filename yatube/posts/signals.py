@@ -0,0 +1,193 @@
+from django.core.mail import send_mail
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from . import (
+    caching, counters, images, search, thumbnails, timeline, trending)
+from .models import Comment, Counter, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded_fields(sender, instance, **kwargs):
+    # Поля могли быть отложены через only(), тогда не грузим их лишним
+    # запросом: изменение все равно пройдет через полную модель.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image) or None
+
+
+# Поля, которые видны в карточках постов: их изменение сбрасывает
+# фрагменты всех лент
+USER_CARD_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_CARD_FIELDS = ('title', 'slug')
+
+
+def card_fields(instance, fields):
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+@receiver(post_init, sender=User)
+def remember_user_names(sender, instance, **kwargs):
+    instance._loaded_card_fields = card_fields(instance, USER_CARD_FIELDS)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_titles(sender, instance, **kwargs):
+    instance._loaded_card_fields = card_fields(instance, GROUP_CARD_FIELDS)
+
+
+def card_fields_changed(instance, fields, created):
+    """Изменились ли поля карточки; запоминает новые значения."""
+    loaded = instance._loaded_card_fields
+    instance._loaded_card_fields = card_fields(instance, fields)
+    return not created and loaded != instance._loaded_card_fields
+
+
+def bump_post_scopes(post):
+    caching.bump(
+        caching.POSTS,
+        caching.author_scope(post.author_id),
+        caching.group_scope(post.group_id),
+    )
+    if post._loaded_group_id != post.group_id:
+        caching.bump(caching.group_scope(post._loaded_group_id))
+
+
+def count_group_post(group_id, delta):
+    if group_id is not None:
+        counters.add(counters.group_posts(group_id), delta)
+
+
+@receiver(post_save, sender=Post)
+@transaction.atomic
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.add(counters.TOTAL_POSTS, 1)
+        counters.change_stats(instance.author_id, posts_count=1)
+        count_group_post(instance.group_id, 1)
+        timeline.fan_out(instance)
+    elif instance._loaded_group_id != instance.group_id:
+        count_group_post(instance._loaded_group_id, -1)
+        count_group_post(instance.group_id, 1)
+    image_changed = instance.image.name != instance._loaded_image
+    if instance.image and (created or image_changed):
+        images.acquire(instance.image.name)
+        thumbnails.enqueue(instance.image.name)
+    if not created and image_changed and instance._loaded_image:
+        images.release(instance._loaded_image)
+    bump_post_scopes(instance)
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_image = instance.image.name or None
+
+
+@receiver(post_delete, sender=Post)
+@transaction.atomic
+def post_deleted(sender, instance, **kwargs):
+    counters.add(counters.TOTAL_POSTS, -1)
+    counters.change_stats(instance.author_id, posts_count=-1)
+    count_group_post(instance.group_id, -1)
+    if instance.image:
+        images.release(instance.image.name)
+    bump_post_scopes(instance)
+
+
+@receiver(post_save, sender=Comment)
+@transaction.atomic
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_stats(instance.author_id, comments_count=1)
+        counters.change_comments(instance.post_id, 1)
+        trending.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+@transaction.atomic
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_stats(instance.author_id, comments_count=-1)
+    counters.change_comments(instance.post_id, -1)
+    trending.comment_removed(instance)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    caching.bump(caching.group_scope(instance.id))
+    # У новой группы еще нет постов, а описание видно только на ее
+    # странице
+    if card_fields_changed(instance, GROUP_CARD_FIELDS, created):
+        caching.bump(caching.GROUPS)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # Посты группы остаются без группы через SET_NULL, сигналов по ним нет
+    Counter.objects.filter(name=counters.group_posts(instance.id)).delete()
+    caching.bump(caching.GROUPS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    # Регистрация, вход и смена пароля или почты ленты не меняют
+    if card_fields_changed(instance, USER_CARD_FIELDS, created):
+        caching.bump(caching.USERS)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    caching.bump(caching.USERS)
+
+
+@receiver(post_save, sender=Follow)
+@transaction.atomic
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_stats(instance.author_id, followers_count=1)
+        counters.change_stats(instance.user_id, following_count=1)
+        timeline.subscribe(instance.user_id, instance.author_id)
+        trending.follows_changed(instance.author_id, 1)
+        notify_author(instance)
+    caching.bump(caching.follows_scope(instance.user_id))
+
+
+def notify_author(follow):
+    author = follow.author
+    if not author.email:
+        return
+    # EMAIL_BACKEND только ставит письмо в очередь, см. users.outbox
+    send_mail(
+        'У вас новый подписчик',
+        render_to_string('posts/emails/new_follower.txt', {
+            'author': author, 'follower': follow.user}),
+        None,
+        [author.email],
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    follow_removed(instance.user_id, instance.author_id)
+
+
+@transaction.atomic
+def follow_removed(user_id, author_id):
+    """Счетчики, лента и кэш после удаления подписки, см. unfollow."""
+    counters.change_stats(author_id, followers_count=-1)
+    counters.change_stats(user_id, following_count=-1)
+    timeline.unsubscribe(user_id, author_id)
+    trending.follows_changed(author_id, -1)
+    caching.bump(caching.follows_scope(user_id))
+
+
+def install_search(using, **kwargs):
+    # SQLite пересоздает таблицу при изменении схемы Post и теряет
+    # триггеры индекса, поэтому возвращаем их после каждой миграции.
+    connection = connections[using]
+    if not search.is_supported(connection):
+        return
+    if 'posts_post' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        search.install(cursor)
@@ -0,0 +1,68 @@
+"""Хранилище картинок постов по хешу содержимого.
+
+Имя файла — SHA-256 его байтов, поэтому одинаковые картинки
+(повторные загрузки, перепосты мемов) лежат на диске один раз, а
+sorl-thumbnail находит для них уже готовые миниатюры по тому же имени.
+Сколько постов ссылается на файл, считает posts.images.
+"""
+import hashlib
+import os
+from uuid import uuid4
+
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK = 64 * 1024
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """posts/ab/cd/abcd....jpg: каталог из upload_to и расширение файла."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+
+def is_hashed(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    parts = name.split('/')
+    return (
+        len(stem) == 64 and len(parts) >= 3
+        and parts[-3] == stem[:2] and parts[-2] == stem[2:4]
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Исходное имя все равно заменит хеш, подбирать свободное незачем
+        return name
+
+    def _save(self, name, content):
+        name = hashed_name(name, content_hash(content))
+        if not self.exists(name):
+            # Через временный файл: одновременная загрузка тех же байтов
+            # просто заменит файл таким же, не наткнувшись на чужой
+            temporary = super()._save(f'{name}.{uuid4().hex}.tmp', content)
+            os.replace(self.path(temporary), self.path(name))
+        else:
+            # Файл без ссылок мог ждать сборки мусора: новая загрузка
+            # заново отсчитывает ему срок, пока пост еще не сохранен
+            from .models import StoredImage
+            os.utime(self.path(name))
+            StoredImage.objects.filter(
+                name=name, released__isnull=False,
+            ).update(released=timezone.now())
+        return name
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import following
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def followed_authors(context):
+    """id авторов, на которых подписан зритель: {% if id in followed %}."""
+    return following.ids(context['request'].user)
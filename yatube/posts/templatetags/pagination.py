@@ -0,0 +1,55 @@
+from django import template
+
+from ..utils import CURSOR_PAGE_THRESHOLD, encode_cursor
+
+register = template.Library()
+
+
+def _is_cursor(page_obj):
+    return getattr(page_obj, 'is_cursor', False)
+
+
+def _query(context, **params):
+    """Строка запроса текущей страницы с новыми параметрами навигации."""
+    query = context['request'].GET.copy()
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return f'?{query.urlencode()}'
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, number):
+    return _query(context, page=number)
+
+
+@register.simple_tag(takes_context=True)
+def next_page_query(context, page_obj):
+    """Ссылка вперед: номер страницы на мелких страницах, иначе курсор."""
+    if not page_obj.object_list:
+        return _query(context)
+    if _is_cursor(page_obj):
+        return _query(context, after=page_obj.next_cursor())
+    # Курсор строится по полю сортировки ленты; без поля, как в поиске
+    # и трендах, остаются только номера страниц
+    field = page_obj.paginator.field
+    if field and page_obj.number >= CURSOR_PAGE_THRESHOLD:
+        return _query(context, after=encode_cursor(page_obj[-1], field))
+    return _query(context, page=page_obj.next_page_number())
+
+
+@register.simple_tag(takes_context=True)
+def previous_page_query(context, page_obj):
+    if not page_obj.object_list:
+        return _query(context)
+    if _is_cursor(page_obj):
+        return _query(context, before=page_obj.previous_cursor())
+    return _query(context, page=page_obj.previous_page_number())
+
+
+@register.simple_tag
+def shallow_page_range(page_obj):
+    """Номера страниц, которые отрисовываются в навигации."""
+    last = min(page_obj.paginator.num_pages, CURSOR_PAGE_THRESHOLD)
+    return range(1, last + 1)
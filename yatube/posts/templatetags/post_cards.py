@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from .. import caching
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Готовые карточки постов страницы, см. caching.render_cards."""
+    return [mark_safe(card) for card in caching.render_cards(posts)]
@@ -0,0 +1,39 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+# Ширина картинки карточки: весь контейнер Bootstrap
+CARD_SIZES = '(min-width: 1200px) 1110px, 100vw'
+
+
+@register.simple_tag
+def post_thumbnail(image, variant='card'):
+    """Готовая миниатюра, а пока ее нет — исходная картинка."""
+    if not image:
+        return ''
+    return thumbnails.ready_url(image, variant) or image.url
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(image, sizes=CARD_SIZES):
+    """<picture> с srcset из готовых вариантов и ленивой загрузкой.
+
+    Последний формат из POST_IMAGE_FORMATS идет в srcset самого <img>,
+    остальные — в <source>, и браузер берет первый поддерживаемый.
+    """
+    if not image:
+        return {}
+    *preferred, fallback = thumbnails.image_formats()
+    sources = []
+    for image_format in preferred:
+        srcset = thumbnails.ready_srcset(image, image_format)
+        if srcset:
+            sources.append((f'image/{image_format.lower()}', srcset))
+    return {
+        'src': post_thumbnail(image),
+        'srcset': thumbnails.ready_srcset(image, fallback),
+        'sources': sources,
+        'sizes': sizes,
+    }
@@ -0,0 +1,45 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..management.commands import benchmark
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'generate_dataset', users=20, groups=2, posts=100,
+            comments=200, follows=3, stdout=StringIO())
+
+    def test_generate_dataset(self):
+        """Команда создает связанный набор данных и пересчитывает ленты"""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        author = Post.objects.first().author
+        self.assertEqual(author.stats.posts_count, author.posts.count())
+
+    def test_routes_cover_all_apps(self):
+        """В прогон попадают маршруты posts, users и about"""
+        routes = benchmark.routes()
+        for name in ('posts:post_detail', 'users:login', 'about:tech'):
+            with self.subTest(name=name):
+                self.assertIn(name, routes)
+
+    def test_run_route(self):
+        """Прогон маршрута собирает замеры и не меняет данные"""
+        posts = Post.objects.count()
+        for name in ('posts:main_page', 'posts:profile_follow'):
+            with self.subTest(name=name):
+                result = benchmark.run((name, 5, 1, 0.5, 1.5))
+                self.assertEqual(result['requests'], 5)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_mean'], 0)
+        self.assertEqual(Post.objects.count(), posts)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Post
+from ..utils import COMMENTS_LIMIT
+
+User = get_user_model()
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for number in range(COMMENTS_LIMIT + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_first_page_is_rendered_inline(self):
+        """На странице поста только первая пачка, новые сверху"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        page = response.context['comments_page']
+        self.assertEqual(len(page), COMMENTS_LIMIT)
+        self.assertEqual(
+            page[0].text, f'Комментарий {COMMENTS_LIMIT + 4}')
+        self.assertTrue(page.has_next())
+        self.assertContains(
+            response, reverse('posts:post_comments', args=[self.post.id]))
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдает оставшиеся комментарии без повторов"""
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id])
+        ).context['comments_page']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.id]),
+            {'after': first.next_cursor()})
+        page = response.context['comments_page']
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+        self.assertFalse({c.pk for c in first} & {c.pk for c in page})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertNotContains(response, 'Показать еще')
+
+    def test_fragment_of_missing_post(self):
+        """Фрагмент несуществующего поста отвечает 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.id + 1]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_count_is_denormalized(self):
+        """Число комментариев хранится в посте и пересчитывается"""
+        def total():
+            return Post.objects.get(pk=self.post.pk).comments_count
+
+        self.assertEqual(total(), COMMENTS_LIMIT + 5)
+        Comment.objects.filter(post=self.post).first().delete()
+        self.assertEqual(total(), COMMENTS_LIMIT + 4)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        counters.recount()
+        self.assertEqual(total(), COMMENTS_LIMIT + 4)
+
+    def test_comment_authors_are_joined(self):
+        """Авторы комментариев не загружаются отдельными запросами"""
+        url = reverse('posts:post_comments', args=[self.post.id])
+        # Пост и комментарии с авторами
+        with self.assertNumQueries(2):
+            self.client.get(url)
@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Counter, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняют счетчики"""
+        self.assertEqual(counters.get(counters.TOTAL_POSTS), 1)
+        self.assertEqual(
+            counters.get(counters.group_posts(self.group.id)), 1)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        Post.objects.filter(pk=self.post.pk).delete()
+        self.assertEqual(counters.get(counters.TOTAL_POSTS), 0)
+        self.assertEqual(
+            counters.get(counters.group_posts(self.group.id)), 0)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки учитываются в статистике"""
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+
+    def test_recount_fixes_drift(self):
+        """Команда recount_stats восстанавливает счетчики"""
+        UserStats.objects.update(posts_count=100, followers_count=7)
+        counters.add(counters.TOTAL_POSTS, 5)
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(counters.get(counters.TOTAL_POSTS), 1)
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 0)
+
+    def test_recount_updates_rows_in_place(self):
+        """Пересчет обнуляет счетчик пустой группы, не удаляя строки"""
+        Post.objects.filter(pk=self.post.pk).update(group=None)
+        counters.add('other', 3)
+        counters.recount()
+        group = Counter.objects.get(name=counters.group_posts(self.group.id))
+        self.assertEqual(group.value, 0)
+        self.assertEqual(counters.get('other'), 3)
+        self.assertEqual(counters.get(counters.TOTAL_POSTS), 1)
+
+    def test_posts_count_in_header_on_every_page(self):
+        """Число постов выводится в шапке не только на главной"""
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, 'Всего постов на сайте: 1')
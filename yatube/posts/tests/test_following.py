@@ -0,0 +1,145 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from .. import following, timeline
+from ..models import Follow, UserStats
+
+User = get_user_model()
+# В TestCase транзакция не фиксируется, поэтому on_commit не срабатывает
+commit_immediately = mock.patch(
+    'django.db.transaction.on_commit', lambda callback: callback())
+
+
+class FollowingCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    @commit_immediately
+    def test_following_set_is_loaded_once(self):
+        """Множество подписок читается из базы один раз"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(following.ids(self.reader), {self.author.id})
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                following.is_following(self.reader, self.author.id))
+            self.assertEqual(
+                following.states(
+                    self.reader, [self.author.id, self.other.id]),
+                {self.author.id: True, self.other.id: False})
+
+    @commit_immediately
+    def test_follow_and_unfollow_reset_set(self):
+        """Подписка и отписка сбрасывают кэш подписок"""
+        self.assertFalse(following.ids(self.reader))
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(following.ids(self.reader), {self.author.id})
+        follow.delete()
+        self.assertFalse(following.ids(self.reader))
+
+    def test_uncommitted_set_is_not_cached(self):
+        """До фиксации транзакции множество не попадает в кэш"""
+        following.ids(self.reader)
+        with self.assertNumQueries(1):
+            following.ids(self.reader)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_heavy_authors_single_query(self):
+        """Популярные авторы ленты читаются одним запросом"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                timeline.heavy_authors(self.reader), [self.author.id])
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(timeline.heavy_authors(self.reader), [])
+
+    def test_author_with_followers_can_be_followed(self):
+        """На автора с подписчиками можно подписаться"""
+        Follow.objects.create(user=self.other, author=self.author)
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username]))
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+
+    def test_profile_shows_follow_state(self):
+        """Кнопка в профиле отражает подписку зрителя"""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertContains(self.client.get(url), 'Подписаться')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(url), 'Отписаться')
+
+
+class FollowRaceTest(TransactionTestCase):
+    """Одновременные запросы из потоков, каждый со своим соединением."""
+
+    THREADS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='author')
+
+    def hammer(self, name):
+        url = reverse(name, args=[self.author.username])
+        barrier = threading.Barrier(self.THREADS, timeout=10)
+        statuses, errors = [], []
+
+        def click(client):
+            barrier.wait()
+            try:
+                statuses.append(client.get(url).status_code)
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = []
+        for _ in range(self.THREADS):
+            client = Client()
+            client.force_login(self.reader)
+            threads.append(threading.Thread(target=click, args=[client]))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return statuses
+
+    def followers(self):
+        return UserStats.objects.get(user=self.author).followers_count
+
+    def test_concurrent_follow_and_unfollow(self):
+        """Одновременные клики дают одну подписку и верные счетчики"""
+        statuses = self.hammer('posts:profile_follow')
+        self.assertEqual(statuses, [302] * self.THREADS)
+        self.assertEqual(Follow.objects.filter(
+            user=self.reader, author=self.author).count(), 1)
+        self.assertEqual(self.followers(), 1)
+        deleted = []
+        unfollow = following.unfollow
+
+        def record(user, author):
+            deleted.append(unfollow(user, author))
+            return deleted[-1]
+
+        with mock.patch.object(following, 'unfollow', record):
+            statuses = self.hammer('posts:profile_unfollow')
+        self.assertEqual(statuses, [302] * self.THREADS)
+        self.assertEqual(sorted(deleted), [0] * (self.THREADS - 1) + [1])
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.followers(), 0)
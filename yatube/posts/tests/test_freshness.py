@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group)
+        cls.other_post = Post.objects.create(
+            author=cls.user, text='Чужой пост', group=cls.other_group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        # Cookie CSRF выдает первая страница с формой, и ETag вошедшего
+        # читателя после этого меняется один раз
+        self.client.get(reverse('posts:post_detail', args=[self.post.id]))
+
+    def urls(self):
+        return {
+            'posts:main_page': reverse('posts:main_page'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=[self.group.slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[self.author.username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[self.post.id]),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_not_rendered(self):
+        """Без изменений страница отвечает 304 без ленты и шаблона"""
+        # Сессия и пользователь, счетчик постов и ключ страницы
+        queries = {
+            'posts:main_page': 3,
+            'posts:group_list': 4,
+            'posts:profile': 4,
+            'posts:post_detail': 4,
+            'posts:follow_index': 3,
+        }
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(queries[name]):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_etag_survives_lost_cache(self):
+        """ETag строится по базе: без кэша процесса ответ все равно 304"""
+        for name, url in self.urls().items():
+            with self.subTest(name=name):
+                etag = self.client.get(url)['ETag']
+                cache.clear()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_update_etag(self):
+        """Изменение данных страницы меняет ее ETag"""
+        changes = {
+            'posts:main_page': lambda: Post.objects.create(
+                author=self.author, text='Новый пост'),
+            'posts:post_detail': lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'),
+            'posts:profile': lambda: Follow.objects.create(
+                user=self.user, author=self.author),
+            'posts:group_list': lambda: Group.objects.filter(
+                pk=self.group.pk).first().save(),
+        }
+        for name, change in changes.items():
+            with self.subTest(name=name):
+                url = self.urls()[name]
+                etag = self.client.get(url)['ETag']
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_unrelated_edit_keeps_group_page(self):
+        """Правка поста другой группы не сбрасывает страницу группы"""
+        url = self.urls()['posts:group_list']
+        etag = self.client.get(url)['ETag']
+        self.other_post.text = 'Исправленный пост'
+        self.other_post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_viewer(self):
+        """Другой пользователь не получает чужую страницу из кэша"""
+        url = self.urls()['posts:main_page']
+        etag = self.client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
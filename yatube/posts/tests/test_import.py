@@ -0,0 +1,107 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from .. import counters, search, timeline
+from ..models import Comment, Follow, Group, Post, User
+
+INDEXES_SQL = (
+    "SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger') "
+    "AND tbl_name IN ('posts_post', 'posts_comment') ORDER BY name")
+
+
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            if name.endswith('.csv'):
+                file.write(content)
+            else:
+                file.writelines(
+                    json.dumps(record, ensure_ascii=False) + '\n'
+                    for record in content)
+        return path
+
+    def import_content(self, **files):
+        call_command('import_content', stdout=StringIO(), **files)
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(INDEXES_SQL)
+            return cursor.fetchall()
+
+    def test_import_resolves_references(self):
+        """Ссылки по username и slug превращаются в ключи, даты сохраняются"""
+        self.import_content(
+            users=self.write('users.ndjson', [
+                {'username': 'leo'}, {'username': 'fedor'}]),
+            groups=self.write(
+                'groups.csv', 'title,slug,description\nКлассика,classic,\n'),
+            posts=self.write('posts.ndjson', [
+                {'id': 10, 'author': 'leo', 'group': 'classic',
+                 'text': 'Война и мир', 'pub_date': '1869-01-01T00:00:00Z'},
+                {'author': 'nobody', 'text': 'Пропущу'},
+            ]),
+            comments=self.write('comments.ndjson', [
+                {'post': 10, 'author': 'fedor', 'text': 'Длинно'},
+                {'post': 99, 'author': 'fedor', 'text': 'К чужому посту'},
+            ]),
+            follows=self.write('follows.ndjson', [
+                {'user': 'fedor', 'author': 'leo'},
+                {'user': 'fedor', 'author': 'leo'},
+                {'user': 'leo', 'author': 'leo'},
+            ]),
+        )
+        post = Post.objects.get()
+        self.assertEqual(post.pk, 10)
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.group, Group.objects.get(slug='classic'))
+        self.assertEqual(post.pub_date.year, 1869)
+        self.assertEqual(Comment.objects.get().post, post)
+        self.assertEqual(Follow.objects.count(), 1)
+        leo = User.objects.get(username='leo')
+        self.assertFalse(leo.has_usable_password())
+
+    def test_import_refreshes_derived_data(self):
+        """После загрузки пересчитаны счетчики и ленты подписок"""
+        User.objects.create_user(username='reader')
+        User.objects.create_user(username='writer')
+        self.import_content(
+            posts=self.write('posts.ndjson', [
+                {'author': 'writer', 'text': 'Первый'},
+                {'author': 'writer', 'text': 'Второй'},
+            ]),
+            follows=self.write('follows.ndjson', [
+                {'user': 'reader', 'author': 'writer'}]),
+        )
+        reader = User.objects.get(username='reader')
+        self.assertEqual(counters.get(counters.TOTAL_POSTS), 2)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertEqual(timeline.feed_for(reader).count(), 2)
+
+    def test_defer_indexes_restores_indexes_and_search(self):
+        """Снятые на время загрузки индексы и поиск возвращаются"""
+        User.objects.create_user(username='writer')
+        before = self.indexes()
+        call_command(
+            'import_content', stdout=StringIO(), defer_indexes=True,
+            posts=self.write('posts.ndjson', [
+                {'author': 'writer', 'text': 'Пушистый котенок'}]))
+        self.assertEqual(self.indexes(), before)
+        self.assertEqual(search.count_matches('котенок'), (1, False))
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from .. import timeline
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedIndexesTest(TestCase):
+    """Основные запросы страниц читают индексы, а не сортируют таблицу."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.user, text='LOL')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_are_read_by_index(self):
+        """Ленты главной, группы и профиля идут по составным индексам"""
+        feeds = {
+            'post_pub_date_idx': Post.objects.for_feed(),
+            'post_group_pub_date_idx': self.group.posts.for_feed(),
+            'post_author_pub_date_idx': Post.objects.for_feed().filter(
+                author=self.user),
+        }
+        for index_name, queryset in feeds.items():
+            with self.subTest(index_name=index_name):
+                self.assertUsesIndex(queryset[:10], index_name)
+
+    def test_comments_are_read_by_index(self):
+        """Комментарии поста выбираются по индексу (post, -created)"""
+        self.assertUsesIndex(
+            self.post.comments.select_related('author'),
+            'comment_post_created_idx',
+        )
+
+    def test_follow_pair_lookup_uses_unique_index(self):
+        """Проверка подписки ищет пару по уникальному индексу"""
+        plan = Follow.objects.filter(
+            user=self.user, author=self.user).explain()
+        self.assertIn('SEARCH posts_follow USING COVERING INDEX', plan)
+
+    def test_follow_feed_searches_timeline(self):
+        """Лента подписок читает только записи ленты читателя"""
+        plan = timeline.feed_for(self.user).for_feed()[:10].explain()
+        self.assertIn('SEARCH posts_timelineentry', plan)
+        self.assertNotIn('SCAN', plan)
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Страницы укладываются ровно в settings.VIEW_QUERY_BUDGETS при любом
+# наполнении ленты. Сюда входят выборка сессии и пользователя для
+# авторизованного клиента (кэши обоих очищаются, считается худший
+# случай) и счетчик постов в шапке, а у группы, профиля и поста еще
+# поиск ключа для ETag (posts.freshness). Лента подписок читает
+# множество подписок, в работе оно берется из кэша (posts.following),
+# и популярных авторов одним запросом по индексам (posts.timeline).
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Первый пост', group=cls.group)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def fill(self, count):
+        """Добавляет посты разных авторов с комментариями."""
+        for number in range(count):
+            author = User.objects.create_user(username=f'author_{number}')
+            Follow.objects.create(user=self.user, author=author)
+            post = Post.objects.create(
+                author=author, text='Пост', group=self.group)
+            Comment.objects.create(post=self.post, author=author, text='Да')
+            Comment.objects.create(post=post, author=author, text='Нет')
+
+    def urls(self):
+        return {
+            'posts:main_page': reverse('posts:main_page'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def test_views_fit_query_budget(self):
+        """Число запросов не зависит от количества постов на странице"""
+        for count in (0, 15):
+            self.fill(count)
+            for name, url in self.urls().items():
+                with self.subTest(name=name, posts=count):
+                    cache.clear()
+                    budget = settings.VIEW_QUERY_BUDGETS[name]
+                    with self.assertNumQueries(budget):
+                        self.client.get(url)
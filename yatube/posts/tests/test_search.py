@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Коты любят спать на солнце')
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки любят гулять')
+        cls.client = Client()
+
+    def test_search_page_finds_posts(self):
+        """Страница поиска показывает только подходящие посты"""
+        response = self.client.get(reverse('posts:search'), {'q': 'коты'})
+        self.assertEqual(list(response.context['page_obj']), [self.cats])
+
+    @override_settings(SEARCH_RANK_WINDOW=1)
+    def test_total_counts_ranked_window(self):
+        """Число найденных совпадает с числом показанных постов"""
+        response = self.client.get(reverse('posts:search'), {'q': 'любят'})
+        self.assertEqual(response.context['total'], 1)
+        self.assertTrue(response.context['more'])
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertContains(response, 'показаны самые новые')
+
+    def test_index_follows_updates_and_deletes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        Post.objects.filter(pk=self.dogs.pk).update(text='Собаки и коты')
+        self.assertEqual(
+            set(search_posts('коты')), {self.cats, self.dogs})
+        Post.objects.filter(pk=self.cats.pk).delete()
+        self.assertEqual(list(search_posts('коты')), [self.dogs])
+
+    def test_results_are_ranked(self):
+        """Пост, где слово встречается чаще, идет первым"""
+        often = Post.objects.create(
+            author=self.user, text='Любят, любят, очень любят')
+        self.assertEqual(search_posts('любят')[0], often)
+
+    def test_query_syntax_is_escaped(self):
+        """Служебные символы FTS5 в запросе не приводят к ошибке"""
+        for query in ('"', 'NOT', 'коты*', 'a:b', '(('):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс"""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'гулять'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.dogs])
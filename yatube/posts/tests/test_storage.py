@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import images, thumbnails
+from ..models import Post, StoredImage, ThumbnailJob
+from ..storage import is_hashed
+from ..templatetags.post_thumbnails import post_thumbnail
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Та же картинка с другим цветом в палитре
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\xFF\x00\x00')
+
+
+def upload(name, content=SMALL_GIF):
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, image):
+        return Post.objects.create(author=self.user, text='Мем', image=image)
+
+    def refs(self, name):
+        return StoredImage.objects.get(name=name).refs
+
+    def files(self):
+        return [
+            name
+            for _, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+            for name in names
+        ]
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с общим счетчиком"""
+        first = self.create(upload('meme.gif'))
+        second = self.create(upload('repost.GIF'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertTrue(first.image.name.endswith('.gif'))
+        self.assertEqual(len(self.files()), 1)
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_thumbnails_are_reused(self):
+        """Повторная загрузка сразу получает готовые миниатюры"""
+        first = self.create(upload('meme.gif'))
+        for job in thumbnails.claim(10):
+            thumbnails.render(job)
+        second = self.create(upload('repost.gif'))
+        self.assertNotEqual(
+            post_thumbnail(second.image), second.image.url)
+        self.assertFalse(ThumbnailJob.objects.exclude(
+            status=ThumbnailJob.DONE).exists())
+        self.assertEqual(ThumbnailJob.objects.get().image, first.image.name)
+
+    def test_orphans_are_collected_after_grace(self):
+        """Картинка без ссылок удаляется после удаления и правки постов"""
+        first = self.create(upload('meme.gif'))
+        second = self.create(upload('repost.gif'))
+        name = first.image.name
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        second.image = upload('new.gif', OTHER_GIF)
+        second.save()
+        self.assertEqual(self.refs(name), 0)
+        self.assertEqual(self.refs(second.image.name), 1)
+        self.assertEqual(images.collect(), 0)
+        self.assertEqual(images.collect(grace=0), 1)
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertEqual(len(self.files()), 1)
+        self.assertTrue(second.image.storage.exists(second.image.name))
+
+    def test_reupload_postpones_collection(self):
+        """Повторная загрузка файла без ссылок откладывает его удаление"""
+        post = self.create(upload('meme.gif'))
+        name = post.image.name
+        post.delete()
+        StoredImage.objects.filter(name=name).update(
+            released=timezone.now() - timedelta(days=1))
+        os.utime(post.image.storage.path(name), (0, 0))
+        # Файл сохранен заново, а пост с ним еще не записан
+        post.image.storage.save('posts/again.gif', upload('again.gif'))
+        self.assertEqual(images.collect(grace=60), 0)
+        self.assertTrue(post.image.storage.exists(name))
+        StoredImage.objects.filter(name=name).update(
+            released=timezone.now() - timedelta(days=1))
+        self.assertEqual(images.collect(grace=60), 0)
+
+    def test_dedupe_media_moves_legacy_files(self):
+        """dedupe_media переносит старые файлы под хеш и убирает дубли"""
+        legacy = FileSystemStorage()
+        names = [
+            legacy.save(f'posts/{name}', ContentFile(content))
+            for name, content in (
+                ('a.gif', SMALL_GIF), ('b.gif', SMALL_GIF),
+                ('c.gif', OTHER_GIF), ('orphan.gif', SMALL_GIF),
+            )
+        ]
+        os.utime(legacy.path(names[-1]), (0, 0))
+        posts = [self.create(name) for name in names[:3]]
+        call_command(
+            'dedupe_media', '--delete-orphans',
+            stdout=StringIO())
+        first, second, other = (
+            Post.objects.get(pk=post.pk).image.name for post in posts)
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(is_hashed(first) and is_hashed(other))
+        self.assertEqual(len(self.files()), 2)
+        self.assertEqual(self.refs(first), 2)
+        self.assertEqual(self.refs(names[0]), 0)
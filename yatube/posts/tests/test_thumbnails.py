@@ -0,0 +1,166 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.loader import get_template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post, ThumbnailJob
+from ..templatetags.post_thumbnails import post_image, post_thumbnail
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки хранятся под одним именем, и kvstore sorl
+        # в кэше помнит миниатюры, нарисованные в прошлых тестах
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+
+    def test_new_image_is_enqueued(self):
+        """Картинка нового поста попадает в очередь"""
+        job = ThumbnailJob.objects.get(image=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+
+    def test_original_is_served_until_thumbnail_is_ready(self):
+        """До обработки очереди отдается исходная картинка"""
+        self.assertEqual(
+            post_thumbnail(self.post.image), self.post.image.url)
+        for job in thumbnails.claim(10):
+            self.assertTrue(thumbnails.render(job))
+        url = post_thumbnail(self.post.image)
+        self.assertNotEqual(url, self.post.image.url)
+        self.assertTrue(ThumbnailJob.objects.filter(
+            image=self.post.image.name, status=ThumbnailJob.DONE).exists())
+
+    def test_ready_thumbnail_changes_etag(self):
+        """Готовая миниатюра меняет ETag страниц с постом"""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        for job in thumbnails.claim(10):
+            self.assertTrue(thumbnails.render(job))
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    @override_settings(THUMBNAIL_LEASE_SECONDS=60)
+    def test_stale_claim_returns_to_queue(self):
+        """Задача упавшего обработчика возвращается в очередь"""
+        self.assertEqual(len(thumbnails.claim(10)), 1)
+        self.assertEqual(thumbnails.claim(10), [])
+        job = ThumbnailJob.objects.filter(image=self.post.image.name)
+        job.update(claimed=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(len(thumbnails.claim(10)), 1)
+        self.assertEqual(job.get().attempts, 1)
+        job.update(
+            claimed=timezone.now() - timedelta(minutes=2),
+            attempts=settings.THUMBNAIL_MAX_ATTEMPTS - 1)
+        self.assertEqual(thumbnails.claim(10), [])
+        self.assertEqual(job.get().status, ThumbnailJob.FAILED)
+
+    def test_new_upload_retries_failed_job(self):
+        """Новая загрузка картинки возвращает упавшую задачу в очередь"""
+        ThumbnailJob.objects.update(
+            status=ThumbnailJob.FAILED,
+            attempts=settings.THUMBNAIL_MAX_ATTEMPTS)
+        Post.objects.create(
+            author=self.user, text='Еще раз', image=SimpleUploadedFile(
+                name='again.gif', content=SMALL_GIF,
+                content_type='image/gif'))
+        job = ThumbnailJob.objects.get(image=self.post.image.name)
+        self.assertEqual(job.status, ThumbnailJob.PENDING)
+        self.assertEqual(job.attempts, 0)
+
+    def test_text_edit_does_not_enqueue_again(self):
+        """Правка текста не ставит картинку в очередь повторно"""
+        ThumbnailJob.objects.update(status=ThumbnailJob.DONE)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertFalse(ThumbnailJob.objects.filter(
+            status=ThumbnailJob.PENDING).exists())
+
+    def test_responsive_variants_are_rendered(self):
+        """Ширины srcset до ширины исходника рисуются заранее"""
+        raw = BytesIO()
+        Image.new('RGB', (1000, 500), 'white').save(raw, 'PNG')
+        post = Post.objects.create(
+            author=self.user, text='Фото', image=SimpleUploadedFile(
+                name='photo.png', content=raw.getvalue(),
+                content_type='image/png'))
+        self.assertEqual(post_image(post.image)['srcset'], '')
+        for job in thumbnails.claim(10):
+            self.assertTrue(thumbnails.render(job))
+        context = post_image(post.image)
+        widths = [
+            candidate.split()[-1]
+            for candidate in context['srcset'].split(', ')
+        ]
+        self.assertEqual(widths, [
+            f'{width}w' for width in settings.POST_IMAGE_WIDTHS
+            if width <= 1000])
+        self.assertEqual(context['src'], post_thumbnail(post.image))
+        card = get_template('includes/card_post.html').render(
+            {'post': post})
+        self.assertIn(f'srcset="{context["srcset"]}"', card)
+        self.assertIn('loading="lazy"', card)
+
+    def test_small_image_is_not_upscaled(self):
+        """Для картинки меньше всех ширин srcset пуст, карточка готова"""
+        for job in thumbnails.claim(10):
+            self.assertTrue(thumbnails.render(job))
+        self.assertEqual(post_image(self.post.image)['srcset'], '')
+        self.assertNotEqual(
+            post_thumbnail(self.post.image), self.post.image.url)
+
+    def test_webp_only_when_pillow_supports_it(self):
+        """WebP пропускается, если Pillow собран без него"""
+        with mock.patch.object(
+                thumbnails.features, 'check', return_value=False):
+            self.assertEqual(thumbnails.image_formats(), ['JPEG'])
+        with mock.patch.object(
+                thumbnails.features, 'check', return_value=True):
+            self.assertEqual(thumbnails.image_formats(), ['WEBP', 'JPEG'])
+            self.assertEqual(post_image(self.post.image)['sources'], [])
@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import timeline
+from ..models import FanoutJob, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def test_follow_backfills_timeline(self):
+        """При подписке в ленту попадают уже опубликованные посты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertIn(self.old_post, timeline.feed_for(self.reader))
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+
+    def test_unfollow_clears_timeline(self):
+        """После отписки посты автора уходят из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+
+    def test_deleted_post_leaves_timeline(self):
+        """Удаленный пост пропадает из ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Удалю')
+        post.delete()
+        self.assertNotIn(post, timeline.feed_for(self.reader))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_heavy_author_is_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но видны в ленте"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Для всех')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertIn(post, timeline.feed_for(self.reader))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=4)
+    def test_heavy_author_turns_light_at_half_limit(self):
+        """Автор снова раскладывается, только потеряв половину подписчиков"""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        self.assertTrue(timeline.is_heavy(self.author.id))
+        post = Post.objects.create(author=self.author, text='Для всех')
+        Follow.objects.filter(user=readers[0]).delete()
+        self.assertTrue(timeline.is_heavy(self.author.id))
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=readers[1]).delete()
+        # Раскладку выполняет очередь, до нее посты подмешиваются
+        self.assertTrue(FanoutJob.objects.filter(author=self.author).exists())
+        self.assertIn(post, timeline.feed_for(readers[2]))
+        call_command('fan_out_timelines', '--once', stdout=StringIO())
+        self.assertFalse(timeline.is_heavy(self.author.id))
+        self.assertFalse(FanoutJob.objects.exists())
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(post=post).values_list(
+                'user_id', flat=True)),
+            {readers[2].id, readers[3].id},
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=4)
+    def test_queued_author_stays_heavy_when_followers_return(self):
+        """Вернувшие подписчиков авторы из очереди не раскладываются"""
+        readers = [
+            User.objects.create_user(username=f'reader{number}')
+            for number in range(4)
+        ]
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+        Follow.objects.filter(user__in=readers[:2]).delete()
+        for reader in readers[:2]:
+            Follow.objects.create(user=reader, author=self.author)
+        self.assertEqual(timeline.process_queue(10), 1)
+        self.assertTrue(timeline.is_heavy(self.author.id))
+        self.assertFalse(FanoutJob.objects.exists())
+
+    def test_rebuild_restores_timeline(self):
+        """Пересборка восстанавливает ленты после массовой загрузки"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        timeline.rebuild()
+        self.assertIn(self.old_post, timeline.feed_for(self.reader))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_rebuild_skips_heavy_authors(self):
+        """При пересборке посты популярных авторов не раскладываются"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        timeline.rebuild()
+        self.assertFalse(TimelineEntry.objects.exists())
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import AuthorActivity, Comment, Follow, Post, PostActivity
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.quiet = User.objects.create_user(username='quiet')
+        cls.post = Post.objects.create(author=cls.author, text='Обсуждают')
+        cls.other = Post.objects.create(author=cls.quiet, text='Меньше')
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, count=1):
+        for _ in range(count):
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+
+    def activity(self, post):
+        return sum(PostActivity.objects.filter(
+            post=post).values_list('comments', flat=True))
+
+    def test_comments_fill_hour_buckets(self):
+        """Комментарий прибавляет к корзине часа, удаление вычитает"""
+        self.comment(self.post, 2)
+        self.assertEqual(PostActivity.objects.count(), 1)
+        self.assertEqual(self.activity(self.post), 2)
+        Comment.objects.filter(post=self.post).first().delete()
+        self.assertEqual(self.activity(self.post), 1)
+
+    def test_follows_fill_author_buckets(self):
+        """Подписка и отписка меняют прирост подписчиков автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        follows = AuthorActivity.objects.filter(author=self.author)
+        self.assertEqual(follows.get().follows, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(follows.get().follows, 0)
+
+    def test_rank_by_comments_and_follows(self):
+        """Подписчики автора поднимают пост выше комментариев"""
+        self.comment(self.post)
+        self.comment(self.other, 2)
+        self.assertEqual(
+            trending.rank('24h'), [self.other.pk, self.post.pk])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            trending.rank('24h'), [self.post.pk, self.other.pk])
+
+    def test_windows_slide_over_buckets(self):
+        """Старая активность видна только в длинных окнах"""
+        PostActivity.objects.create(
+            post=self.other, comments=5,
+            hour=trending.hour_of(timezone.now() - timedelta(days=3)))
+        self.comment(self.post)
+        self.assertEqual(trending.rank('1h'), [self.post.pk])
+        self.assertEqual(trending.rank('24h'), [self.post.pk])
+        self.assertEqual(
+            trending.rank('7d'), [self.other.pk, self.post.pk])
+
+    def test_fresh_posts_of_followed_authors(self):
+        """Свежий пост автора с новыми подписчиками попадает в рейтинг"""
+        self.comment(self.other)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            trending.rank('24h'), [self.post.pk, self.other.pk])
+        Post.objects.filter(pk=self.post.pk).update(
+            pub_date=timezone.now() - timedelta(days=2))
+        self.assertEqual(trending.rank('24h'), [self.other.pk])
+
+    def test_refresh_command_stores_and_prunes(self):
+        """refresh_trending сохраняет рейтинги и удаляет старые корзины"""
+        PostActivity.objects.create(
+            post=self.other, comments=5,
+            hour=trending.hour_of(timezone.now() - timedelta(days=8)))
+        self.comment(self.post)
+        call_command('refresh_trending', stdout=StringIO())
+        self.assertEqual(PostActivity.objects.count(), 1)
+        cache.clear()
+        self.assertEqual(trending.post_ids('7d'), [self.post.pk])
+        # Новые комментарии попадут на страницу после следующего пересчета
+        self.comment(self.other, 3)
+        self.assertEqual(trending.post_ids('24h'), [self.post.pk])
+
+    def test_rebuild_restores_buckets(self):
+        """Пересборка собирает корзины из комментариев после загрузки"""
+        self.comment(self.post, 2)
+        PostActivity.objects.all().delete()
+        trending.rebuild()
+        self.assertEqual(self.activity(self.post), 2)
+
+    def test_trending_page(self):
+        """Страница показывает посты окна в порядке рейтинга"""
+        self.comment(self.post)
+        self.comment(self.other, 2)
+        url = reverse('posts:trending')
+        response = Client().get(url)
+        self.assertEqual(response.context['window'], trending.DEFAULT_WINDOW)
+        self.assertEqual(
+            list(response.context['page_obj']), [self.other, self.post])
+        response = Client().get(url, {'window': 'year'})
+        self.assertEqual(response.context['window'], trending.DEFAULT_WINDOW)
+
+    def test_deleted_post_leaves_trending_page(self):
+        """Удаленный после пересчета пост пропадает со страницы"""
+        self.comment(self.post)
+        self.comment(self.other, 2)
+        trending.refresh()
+        Post.objects.filter(pk=self.other.pk).delete()
+        response = Client().get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
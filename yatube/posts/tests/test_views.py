@@ -1,15 +1,25 @@
 import shutil
 import tempfile
+from datetime import datetime
+from http import HTTPStatus
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db.models import DateTimeField, Value
+from django.http import QueryDict
+from django.test.signals import template_rendered
+from django.utils import timezone
 from django.urls import reverse
 from django import forms
 
+from .. import caching
 from ..models import Comment, Follow, Post, Group
+from ..templatetags.pagination import next_page_query
+from ..utils import decode_cursor, encode_cursor, paginator_create
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -145,17 +155,15 @@ class PostsPagesTest(TestCase):
         Новый пост появляется на главной странице,
         странице группы и в профиле с правильным контекстом
         """
-        cache.clear()
-        responses = (
-            self.authorized_client.get(reverse('posts:main_page')),
-            self.authorized_client.get(
-                reverse('posts:group_list', kwargs={'slug': self.group.slug})
-            ),
-            self.authorized_client.get(
-                reverse('posts:profile', kwargs={'username': self.post.author})
-            )
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.post.author}),
         )
-        for response in responses:
+        for url in urls:
+            # Карточка из кэша не рендерится и не попадает в контекст
+            cache.clear()
+            response = self.authorized_client.get(url)
             context = {
                 response.context['post'].text: self.post.text,
                 response.context['post'].group: self.post.group,
@@ -170,24 +178,74 @@ class PostsPagesTest(TestCase):
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': self.post.id})
         )
-        expected = self.comment
-        comment_object = response.context['comments'].get(id=self.post.id)
-        self.assertEqual(comment_object, expected)
+        comments = response.context['comments_page'].object_list
+        self.assertIn(self.comment, comments)
 
     def test_cache_posts_on_main_page(self):
-        """Проверка кэша на главной странице"""
+        """Лента главной кэшируется до изменения постов"""
+        cache.clear()
         new_post = Post.objects.create(
             author=self.user,
             text='Просто текст',
             group=self.group,
         )
         response_1 = self.authorized_client.get(reverse('posts:main_page'))
-        new_post.delete()
+        Post.objects.filter(pk=new_post.pk).update(text='Без сигналов')
         response_2 = self.authorized_client.get(reverse('posts:main_page'))
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
+        new_post.delete()
         response_3 = self.authorized_client.get(reverse('posts:main_page'))
         self.assertNotEqual(response_2.content, response_3.content)
+        self.assertNotContains(response_3, 'Без сигналов')
+
+    def test_cache_is_reset_by_author_rename(self):
+        """Переименование автора сбрасывает кэш ленты группы"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.authorized_client.get(url)
+        self.user.first_name = 'Переименован'
+        self.user.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Переименован')
+
+    def test_signup_keeps_feed_cache(self):
+        """Регистрация, смена пароля и новая группа не сбрасывают ленты"""
+        scopes = (caching.USERS, caching.GROUPS)
+        before = caching.versions(*scopes)
+        user = User.objects.create_user(username='newcomer')
+        user.set_password('secret')
+        user.save()
+        Group.objects.create(title='Новая', slug='new', description='Да')
+        self.assertEqual(caching.versions(*scopes), before)
+
+    def test_post_cards_are_cached_until_edit(self):
+        """Карточка берется из кэша, пока пост не изменится"""
+        cache.clear()
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        first = caching.render_cards([post])[0]
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
+        post.text = 'Без сигналов'
+        self.assertEqual(caching.render_cards([post])[0], first)
+        post.save()
+        self.assertIn('Без сигналов', caching.render_cards([post])[0])
+
+    def test_only_missing_cards_are_rendered(self):
+        """Рендерятся только карточки, которых нет в кэше"""
+        cache.clear()
+        Post.objects.create(author=self.user, text='Второй пост')
+        posts = list(Post.objects.for_feed())
+        caching.render_cards(posts[:1])
+        rendered = []
+
+        def on_render(sender, template, **kwargs):
+            rendered.append(template.name)
+
+        template_rendered.connect(on_render)
+        try:
+            caching.render_cards(posts)
+            caching.render_cards(posts)
+        finally:
+            template_rendered.disconnect(on_render)
+        self.assertEqual(rendered.count('includes/card_post.html'), 1)
 
 
 class PaginatorViewTest(TestCase):
@@ -223,6 +281,71 @@ class PaginatorViewTest(TestCase):
                     len(response.context['page_obj']), post_count
                 )
 
+    def test_cursor_pages_follow_each_other(self):
+        """Курсор ?after= продолжает ленту, ?before= возвращает назад"""
+        first_page = list(Post.objects.order_by('-pub_date', '-id')[:10])
+        response = self.authorized_client.get(
+            reverse('posts:main_page'),
+            {'after': encode_cursor(first_page[-1])}
+        )
+        second_page = list(response.context['page_obj'])
+        self.assertEqual(len(second_page), 3)
+        self.assertFalse(response.context['page_obj'].has_next())
+        response = self.authorized_client.get(
+            reverse('posts:main_page'),
+            {'before': encode_cursor(second_page[0])}
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_cursor_past_the_ends_opens_empty_page(self):
+        """Курсор за последним или перед первым постом дает пустую страницу"""
+        posts = Post.objects.order_by('-pub_date', '-id')
+        cursors = {
+            'after': encode_cursor(posts.last()),
+            'before': encode_cursor(posts.first()),
+        }
+        for direction, cursor in cursors.items():
+            with self.subTest(direction=direction):
+                response = self.authorized_client.get(
+                    reverse('posts:main_page'), {direction: cursor})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), 0)
+                self.assertFalse(page_obj.has_other_pages())
+
+    def test_cached_pages_differ(self):
+        """Фрагменты кэша разных страниц не подменяют друг друга"""
+        cache.clear()
+        first = self.authorized_client.get(reverse('posts:main_page'))
+        second = self.authorized_client.get(
+            reverse('posts:main_page'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
+    def test_card_style_is_shipped_once(self):
+        """Стили карточки не повторяются для каждого поста ленты"""
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:main_page'))
+        self.assertEqual(response.content.count(b'.list-rectangle {'), 1)
+
+    @mock.patch('posts.templatetags.pagination.CURSOR_PAGE_THRESHOLD', 1)
+    def test_deep_link_uses_feed_field(self):
+        """Курсор глубокой страницы строится по полю сортировки ленты"""
+        moment = timezone.make_aware(datetime(2000, 1, 1))
+        posts = Post.objects.annotate(
+            feed_date=Value(moment, DateTimeField())).order_by('-pk')
+        request = RequestFactory().get('/follow/')
+        page_obj = paginator_create(request, posts, field='feed_date')
+        query = QueryDict(next_page_query({'request': request}, page_obj)[1:])
+        self.assertEqual(
+            decode_cursor(query['after']), (moment, page_obj[-1].pk))
+
+    def test_broken_cursor_opens_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:main_page'), {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -0,0 +1,201 @@
+"""Подготовка миниатюр картинок вне обработки запросов.
+
+Post.save ставит картинку в очередь ThumbnailJob, команда
+render_thumbnails рисует все варианты из settings.POST_THUMBNAILS и
+адаптивные варианты для srcset (POST_IMAGE_WIDTHS в каждом из
+POST_IMAGE_FORMATS) в пуле процессов, а шаблоны берут только уже
+готовые миниатюры. Задача, которую обработчик не закончил за
+THUMBNAIL_LEASE_SECONDS, возвращается в очередь следующим claim().
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+
+class PrerenderedBackend(ThumbnailBackend):
+    """Бэкенд sorl, который умеет искать миниатюру, не создавая ее."""
+
+    def _full_options(self, source, options):
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self._full_options(source, options))
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PrerenderedBackend()
+
+
+def source(name):
+    """Картинка поста по имени в том же хранилище, что у поля модели.
+
+    Ключ kvstore sorl зависит от хранилища, и миниатюры, нарисованные
+    по имени, должны находиться шаблонами по Post.image.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def ready_url(image, variant):
+    """URL готовой миниатюры или None, если она еще не нарисована."""
+    geometry, options = settings.POST_THUMBNAILS[variant]
+    thumbnail = backend.get_ready_thumbnail(image, geometry, **options)
+    return thumbnail.url if thumbnail else None
+
+
+def image_formats():
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format != 'WEBP' or features.check('webp')
+    ]
+
+
+def source_size(image):
+    """(ширина, высота) исходной картинки; читает файл."""
+    return default.engine.get_image_size(default.engine.get_image(image))
+
+
+def responsive_variants(image_format, source=None):
+    """Пары (ширина, (геометрия, опции)) варианта формата для srcset.
+
+    С размером исходника source пропускаются ширины, для которых его не
+    хватает: увеличенная копия весит больше, а четче не станет.
+    """
+    geometry, options = settings.POST_THUMBNAILS['card']
+    width, height = map(int, geometry.split('x'))
+    variants = []
+    for size in settings.POST_IMAGE_WIDTHS:
+        scaled = round(size * height / width)
+        if source and (size > source[0] or scaled > source[1]):
+            continue
+        variants.append((size, (
+            f'{size}x{scaled}',
+            {
+                **options, 'upscale': False, 'format': image_format,
+                'quality': settings.POST_IMAGE_QUALITY,
+            },
+        )))
+    return variants
+
+
+def all_variants(source=None):
+    variants = list(settings.POST_THUMBNAILS.values())
+    for image_format in image_formats():
+        variants.extend(
+            variant for _, variant
+            in responsive_variants(image_format, source))
+    return variants
+
+
+def ready_srcset(image, image_format):
+    """Значение srcset из готовых вариантов формата; пусто, если их нет.
+
+    Ширины больше исходника не рисуются и сюда не попадают.
+    """
+    found = []
+    for size, (geometry, options) in responsive_variants(image_format):
+        thumbnail = backend.get_ready_thumbnail(image, geometry, **options)
+        if thumbnail:
+            found.append(f'{thumbnail.url} {size}w')
+    return ', '.join(found)
+
+
+def enqueue(image_name):
+    # Имя картинки — хеш содержимого: если задача уже есть, миниатюры
+    # того же файла готовы или рисуются, повторять их незачем. Только
+    # задача, исчерпавшая попытки, получает их заново с новой загрузкой
+    ThumbnailJob.objects.get_or_create(image=image_name)
+    ThumbnailJob.objects.filter(
+        image=image_name, status=ThumbnailJob.FAILED,
+    ).update(
+        status=ThumbnailJob.PENDING, attempts=0, enqueued=timezone.now())
+
+
+def requeue():
+    """Ставит заново все картинки, например после смены вариантов."""
+    ThumbnailJob.objects.exclude(status=ThumbnailJob.PENDING).update(
+        status=ThumbnailJob.PENDING, attempts=0, enqueued=timezone.now())
+
+
+def _retry(jobs):
+    """Возвращает задачи в очередь; после последней попытки — FAILED."""
+    ids = list(jobs.values_list('id', flat=True))
+    # Условия jobs повторяются в UPDATE: задачу, которую уже вернул
+    # другой обработчик, второй раз не считаем
+    returned = jobs.filter(id__in=ids).update(
+        status=ThumbnailJob.PENDING, attempts=F('attempts') + 1)
+    ThumbnailJob.objects.filter(
+        id__in=ids, status=ThumbnailJob.PENDING,
+        attempts__gte=settings.THUMBNAIL_MAX_ATTEMPTS,
+    ).update(status=ThumbnailJob.FAILED)
+    return returned
+
+
+def release_stale():
+    """Возвращает в очередь задачи упавших обработчиков; вернет их число."""
+    expired = timezone.now() - timedelta(
+        seconds=settings.THUMBNAIL_LEASE_SECONDS)
+    return _retry(ThumbnailJob.objects.filter(
+        status=ThumbnailJob.RUNNING, claimed__lt=expired))
+
+
+def claim(limit):
+    """Забирает задачи из очереди; параллельные обработчики не мешают."""
+    release_stale()
+    candidates = ThumbnailJob.objects.filter(
+        status=ThumbnailJob.PENDING).values_list('id', 'image')[:limit]
+    return [
+        (job_id, image) for job_id, image in candidates
+        if ThumbnailJob.objects.filter(
+            id=job_id, status=ThumbnailJob.PENDING
+        ).update(status=ThumbnailJob.RUNNING, claimed=timezone.now())
+    ]
+
+
+def render(job):
+    job_id, image = job
+    try:
+        original = source(image)
+        for geometry, options in all_variants(source_size(original)):
+            backend.get_thumbnail(original, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', image)
+        _retry(ThumbnailJob.objects.filter(id=job_id))
+        return False
+    ThumbnailJob.objects.filter(id=job_id).update(status=ThumbnailJob.DONE)
+    # Карточки постов с этой картинкой теперь ведут на миниатюру: как
+    # и после правки поста, поднимаем версии лент и ETag
+    posts = Post.objects.filter(image=image)
+    scopes = {caching.POSTS}
+    with transaction.atomic():
+        for author_id, group_id in posts.values_list('author_id', 'group_id'):
+            scopes.add(caching.author_scope(author_id))
+            scopes.add(caching.group_scope(group_id))
+        posts.update(updated=timezone.now())
+        caching.bump(*scopes)
+    return True
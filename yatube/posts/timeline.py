@@ -0,0 +1,190 @@
+"""Материализованные ленты подписок.
+
+Лента читателя хранится в таблице TimelineEntry: при публикации пост
+раскладывается по лентам всех подписчиков автора (fan-out-on-write).
+Для популярных авторов раскладка не выполняется, их посты подмешиваются
+в ленту при чтении (fan-out-on-read). Автор становится популярным
+(UserStats.heavy), набрав TIMELINE_FANOUT_LIMIT подписчиков, а обратно
+возвращается, только когда их станет вдвое меньше: иначе подписка и
+отписка на границе каждый раз раскладывали бы все его посты заново.
+Такую раскладку выполняет не запрос отписки, а команда
+fan_out_timelines по очереди FanoutJob; до нее посты автора
+по-прежнему подмешиваются при чтении.
+Популярные авторы читателя выбираются при чтении ленты одним запросом
+по индексам подписок и первичному ключу UserStats.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from .models import FanoutJob, Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE: int = 500
+
+
+def light_limit():
+    """Порог, ниже которого популярный автор снова раскладывается."""
+    return settings.TIMELINE_FANOUT_LIMIT // 2
+
+
+def fanout_state(author_id):
+    """Пара (число подписчиков, популярен ли автор)."""
+    row = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'heavy').first()
+    return row or (0, False)
+
+
+def is_heavy(author_id):
+    return fanout_state(author_id)[1]
+
+
+def set_heavy(author_id, heavy):
+    UserStats.objects.filter(user_id=author_id).update(heavy=heavy)
+
+
+def heavy_authors(user):
+    """Популярные авторы, на которых подписан пользователь."""
+    authors = Follow.objects.filter(user=user).values('author_id')
+    return list(UserStats.objects.filter(
+        heavy=True, user_id__in=authors,
+    ).order_by('user_id').values_list('user_id', flat=True))
+
+
+def _insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_heavy(post.author_id):
+        return
+    readers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    _insert(
+        TimelineEntry(
+            user_id=user_id, post_id=post.id, pub_date=post.pub_date)
+        for user_id in readers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id).values_list('id', 'pub_date')
+    _insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def subscribe(user_id, author_id):
+    count, heavy = fanout_state(author_id)
+    if heavy:
+        return
+    if count >= settings.TIMELINE_FANOUT_LIMIT:
+        # Автор только что стал популярным; уже разложенные посты
+        # остаются в лентах до отписки
+        set_heavy(author_id, True)
+    else:
+        backfill(user_id, author_id)
+
+
+def unsubscribe(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+    count, heavy = fanout_state(author_id)
+    if heavy and count <= light_limit():
+        # Разложить посты по лентам всех подписчиков слишком долго для
+        # запроса: автор остается популярным до обработки очереди
+        FanoutJob.objects.bulk_create(
+            [FanoutJob(author_id=author_id)], ignore_conflicts=True)
+
+
+BACKFILL_SQL = """
+    {insert} {timeline} (user_id, post_id, pub_date)
+    SELECT follow.user_id, post.id, post.pub_date
+    FROM {follow} AS follow
+    JOIN {post} AS post ON post.author_id = follow.author_id
+    WHERE follow.author_id = %s
+"""
+
+
+@transaction.atomic
+def make_light(author_id):
+    """Раскладывает посты автора из очереди; True, если он стал обычным.
+
+    Первой записью снимается признак популярности, поэтому новые посты
+    и подписки, которые ждут этой транзакции, уже видят автора обычным,
+    а сделанные раньше попадают в общую выборку. Если за время в
+    очереди подписчиков снова стало больше порога, автор остается
+    популярным.
+    """
+    light = UserStats.objects.filter(
+        user_id=author_id, heavy=True, followers_count__lte=light_limit(),
+    ).update(heavy=False)
+    if light:
+        sql = BACKFILL_SQL.format(
+            insert=connection.ops.insert_statement(ignore_conflicts=True),
+            timeline=TimelineEntry._meta.db_table,
+            follow=Follow._meta.db_table,
+            post=Post._meta.db_table,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [author_id])
+    FanoutJob.objects.filter(author_id=author_id).delete()
+    return bool(light)
+
+
+def process_queue(limit):
+    """Обрабатывает до limit авторов из очереди; вернет их число."""
+    authors = list(
+        FanoutJob.objects.values_list('author_id', flat=True)[:limit])
+    for author_id in authors:
+        make_light(author_id)
+    return len(authors)
+
+
+def feed_for(user):
+    """Посты ленты подписок пользователя.
+
+    feed_date — время публикации из записи ленты, по нему лента
+    читается индексом (user, -pub_date) на размер страницы.
+    """
+    heavy = heavy_authors(user)
+    if not heavy:
+        posts = Post.objects.filter(timeline_entries__user=user).annotate(
+            feed_date=F('timeline_entries__pub_date'))
+    else:
+        own = TimelineEntry.objects.filter(user=user).values('post_id')
+        posts = Post.objects.filter(
+            Q(pk__in=own) | Q(author_id__in=heavy)
+        ).annotate(feed_date=F('pub_date'))
+    return posts.order_by('-feed_date', '-pk')
+
+
+REBUILD_SQL = """
+    INSERT INTO {timeline} (user_id, post_id, pub_date)
+    SELECT follow.user_id, post.id, post.pub_date
+    FROM {follow} AS follow
+    JOIN {post} AS post ON post.author_id = follow.author_id
+    LEFT JOIN {stats} AS stats ON stats.user_id = follow.author_id
+    WHERE NOT COALESCE(stats.heavy, 0)
+"""
+
+
+@transaction.atomic
+def rebuild():
+    """Заново раскладывает ленты, например после массовой загрузки."""
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    UserStats.objects.filter(followers_count__gte=limit).update(heavy=True)
+    UserStats.objects.filter(followers_count__lt=limit).update(heavy=False)
+    TimelineEntry.objects.all().delete()
+    sql = REBUILD_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+        stats=UserStats._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
@@ -0,0 +1,175 @@
+"""Популярные посты за скользящие окна 1 час, 24 часа и 7 дней.
+
+Сигналы не пересчитывают ничего целиком: новый комментарий прибавляет
+единицу к часовой корзине поста (PostActivity), подписка или отписка
+меняет часовую корзину автора (AuthorActivity). Рейтинг окна суммирует
+корзины, начиная с часа, в который попадает начало окна, поэтому его
+стоимость зависит от числа активных постов за неделю, а не от размера
+posts_comment. Кандидаты в рейтинг — посты с комментариями в окне и
+опубликованные в окне посты авторов, у которых прибавились подписчики.
+
+Рейтинги пересчитывает команда refresh_trending и сохраняет в таблицу
+TrendingPost; страница /trending/ только читает ее, и все процессы
+видят один и тот же список. Пока рейтинг окна ни разу не сохранен, он
+считается при каждом запросе.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import (
+    AuthorActivity, Comment, Post, PostActivity, TrendingPost)
+
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+}
+WINDOW_TITLES = {'1h': 'За час', '24h': 'За сутки', '7d': 'За неделю'}
+DEFAULT_WINDOW = '24h'
+BATCH_SIZE: int = 500
+# Корзины старше самого длинного окна больше не нужны
+KEEP = max(WINDOWS.values())
+
+RANK_SQL = """
+    WITH authors AS (
+        SELECT author_id, SUM(follows) AS follows
+        FROM {author_activity}
+        WHERE hour >= %s
+        GROUP BY author_id
+    ), commented AS (
+        SELECT post_id, SUM(comments) AS comments
+        FROM {post_activity}
+        WHERE hour >= %s
+        GROUP BY post_id
+    ), candidates AS (
+        SELECT post_id FROM commented
+        UNION
+        SELECT post.id
+        FROM authors
+        JOIN {post} AS post ON post.author_id = authors.author_id
+        WHERE authors.follows > 0 AND post.pub_date >= %s
+    ), scored AS (
+        SELECT candidates.post_id AS post_id,
+            COALESCE(commented.comments, 0)
+            + %s * COALESCE(authors.follows, 0) AS score
+        FROM candidates
+        JOIN {post} AS post ON post.id = candidates.post_id
+        LEFT JOIN commented ON commented.post_id = candidates.post_id
+        LEFT JOIN authors ON authors.author_id = post.author_id
+    )
+    SELECT post_id FROM scored
+    WHERE score > 0
+    ORDER BY score DESC, post_id DESC
+    LIMIT %s
+"""
+
+
+def rank_params(start, weight, limit):
+    """Параметры RANK_SQL по порядку, общие с bench_trending."""
+    return [start, start, start, weight, limit]
+
+
+def hour_of(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(window, now=None):
+    return hour_of((now or timezone.now()) - WINDOWS[window])
+
+
+def _add(model, field, delta, **lookup):
+    # Как counters.add: сначала UPDATE, строка создается только для
+    # первого события часа
+    changes = {field: F(field) + delta}
+    if not model.objects.filter(**lookup).update(**changes):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def comment_added(comment):
+    _add(
+        PostActivity, 'comments', 1,
+        post_id=comment.post_id, hour=hour_of(comment.created))
+
+
+def comment_removed(comment):
+    # Корзину уже могли удалить как устаревшую, тогда менять нечего
+    PostActivity.objects.filter(
+        post_id=comment.post_id, hour=hour_of(comment.created),
+    ).update(comments=F('comments') - 1)
+
+
+def follows_changed(author_id, delta):
+    # Время подписки не хранится, отписка уменьшает текущий час
+    _add(
+        AuthorActivity, 'follows', delta,
+        author_id=author_id, hour=hour_of(timezone.now()))
+
+
+def rank(window, now=None):
+    """id самых популярных постов окна, считается по корзинам."""
+    start = connection.ops.adapt_datetimefield_value(
+        window_start(window, now))
+    weight = settings.TRENDING_FOLLOW_WEIGHT
+    sql = RANK_SQL.format(
+        post_activity=PostActivity._meta.db_table,
+        author_activity=AuthorActivity._meta.db_table,
+        post=Post._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, rank_params(
+            start, weight, settings.TRENDING_LIMIT))
+        return [post_id for post_id, in cursor.fetchall()]
+
+
+def post_ids(window):
+    found = list(TrendingPost.objects.filter(
+        window=window).order_by('rank').values_list('post_id', flat=True))
+    return found or rank(window)
+
+
+@transaction.atomic
+def refresh(now=None):
+    """Удаляет устаревшие корзины и сохраняет рейтинги всех окон."""
+    old = hour_of((now or timezone.now()) - KEEP)
+    PostActivity.objects.filter(hour__lt=old).delete()
+    AuthorActivity.objects.filter(hour__lt=old).delete()
+    ranked = {window: rank(window, now) for window in WINDOWS}
+    # Читатели видят старый рейтинг до фиксации транзакции
+    TrendingPost.objects.all().delete()
+    TrendingPost.objects.bulk_create(
+        (
+            TrendingPost(window=window, rank=place, post_id=post_id)
+            for window, ids in ranked.items()
+            for place, post_id in enumerate(ids, 1)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return ranked
+
+
+@transaction.atomic
+def rebuild(now=None):
+    """Собирает корзины комментариев заново, например после загрузки.
+
+    Время подписок не хранится, поэтому корзины авторов не трогаются.
+    """
+    start = hour_of((now or timezone.now()) - KEEP)
+    PostActivity.objects.all().delete()
+    hours = Comment.objects.filter(created__gte=start).annotate(
+        bucket=TruncHour('created')).order_by().values(
+        'post_id', 'bucket').annotate(total=Count('pk'))
+    PostActivity.objects.bulk_create(
+        (
+            PostActivity(
+                post_id=row['post_id'], hour=row['bucket'],
+                comments=row['total'])
+            for row in hours.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
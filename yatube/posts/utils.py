@@ -1,10 +1,119 @@
-from django.core.paginator import Paginator
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 POSTS_LIMIT: int = 10
+COMMENTS_LIMIT: int = 20
+# Начиная с этой страницы навигация переходит на курсоры
+CURSOR_PAGE_THRESHOLD: int = 5
+
+
+def encode_cursor(obj, field='pub_date'):
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает пару (дата, pk) или None для испорченного курсора."""
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        stamp, pk = raw.split('|')
+        moment = parse_datetime(stamp)
+        pk = int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if moment is None:
+        return None
+    return moment, pk
+
+
+class CursorPage(Page):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_cursor(self):
+        return encode_cursor(self[-1], self.paginator.field)
 
+    def previous_cursor(self):
+        return encode_cursor(self[0], self.paginator.field)
 
-def paginator_create(request, model_objects):
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (field, pk) без COUNT и OFFSET."""
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.field = field
+        super().__init__(object_list.order_by(f'-{field}', '-pk'), per_page)
+
+    def _seek(self, direction, cursor):
+        moment, pk = cursor
+        # Нестрогая граница по одному полю позволяет базе начать чтение
+        # индекса прямо с курсора, а не фильтровать ленту с начала
+        return Q(**{f'{self.field}__{direction}e': moment}) & (
+            Q(**{f'{self.field}__{direction}': moment})
+            | Q(**{self.field: moment, f'pk__{direction}': pk})
+        )
+
+    def first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page, has_previous=False)
+
+    def page_after(self, cursor):
+        rows = list(
+            self.object_list.filter(self._seek('lt', cursor))
+            [:self.per_page + 1]
+        )
+        # За последним постом страница пустая, и назад от нее не перейти:
+        # у пустой страницы нет поста для курсора
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page, has_previous=bool(rows))
+
+    def page_before(self, cursor):
+        rows = list(
+            self.object_list.reverse().filter(self._seek('gt', cursor))
+            [:self.per_page + 1]
+        )
+        return CursorPage(
+            rows[:self.per_page][::-1], self,
+            has_next=bool(rows), has_previous=len(rows) > self.per_page)
+
+
+def paginator_create(request, model_objects, field='pub_date'):
+    """Страница ленты; field=None отключает курсоры для своих сортировок."""
+    after = field and decode_cursor(request.GET.get('after', ''))
+    if after:
+        return CursorPaginator(
+            model_objects, POSTS_LIMIT, field).page_after(after)
+    before = field and decode_cursor(request.GET.get('before', ''))
+    if before:
+        return CursorPaginator(
+            model_objects, POSTS_LIMIT, field).page_before(before)
     paginator = Paginator(model_objects, POSTS_LIMIT)
+    # По этому полю ссылки глубоких страниц переходят на курсоры
+    paginator.field = field
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def cursor_page(request, objects, per_page, field):
+    """Страница только по курсору after, без номеров страниц."""
+    paginator = CursorPaginator(objects, per_page, field)
+    after = decode_cursor(request.GET.get('after', ''))
+    return paginator.page_after(after) if after else paginator.first_page()
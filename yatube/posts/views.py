@@ -1,66 +1,112 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
+from . import caching, following, freshness, timeline, trending
+from .search import count_matches, search_posts
 from .forms import PostForm, CommentForm
-from .utils import paginator_create
-from .models import Follow, Post, Group, User
+from .utils import COMMENTS_LIMIT, cursor_page, paginator_create
+from .models import Post, Group, User
 
 
-@cache_page(2, key_prefix='index_page')
+@condition(etag_func=freshness.index_etag)
 def index(request):
-    posts = Post.objects.order_by('-pub_date')
-    posts_count = Post.objects.count()
+    posts = Post.objects.for_feed()
     context = {
         'page_obj': paginator_create(request, posts),
         'posts': posts,
-        'posts_count': posts_count,
+        **caching.feed_cache(request, caching.POSTS),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=freshness.group_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     context = {
         'page_obj': paginator_create(request, posts),
         'group': group,
         'posts': posts,
+        **caching.feed_cache(request, caching.group_scope(group.id)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=freshness.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author=author).order_by('-pub_date')
-    following = (
-        request.user != author
-        and request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user,
-            author=author).exists()
-    )
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post_list = Post.objects.for_feed().filter(author=author)
     context = {
         'author': author,
         'page_obj': paginator_create(request, post_list),
         'post_list': post_list,
-        'following': following,
+        **caching.feed_cache(request, caching.author_scope(author.id)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comments_page(request, post):
+    comments = post.comments.select_related('author').only(
+        'text', 'created', 'post', 'author', 'author__username')
+    return cursor_page(request, comments, COMMENTS_LIMIT, 'created')
+
+
+@condition(etag_func=freshness.post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
     comment_form = CommentForm()
-    comments = post.comments.all()
     context = {
         'post': post,
         'comment_form': comment_form,
-        'comments': comments,
+        'comments_page': comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая пачка комментариев для подгрузки на странице поста."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments_page': comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(query)
+    total, more = count_matches(query)
+    context = {
+        'page_obj': paginator_create(request, posts, field=None),
+        'query': query,
+        'total': total,
+        'more': more,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def trending_index(request):
+    window = request.GET.get('window')
+    if window not in trending.WINDOWS:
+        window = trending.DEFAULT_WINDOW
+    page_obj = paginator_create(
+        request, trending.post_ids(window), field=None)
+    # Посты страницы одним запросом, в порядке рейтинга; удаленные
+    # после пересчета просто пропускаются
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts]
+    context = {
+        'page_obj': page_obj,
+        'window': window,
+        'windows': trending.WINDOW_TITLES,
+    }
+    return render(request, 'posts/trending.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -102,11 +148,14 @@ def add_comment(request, post_id):
 
 
 @login_required
+@condition(etag_func=freshness.follow_etag)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = timeline.feed_for(request.user).for_feed()
     context = {
-        'page_obj': paginator_create(request, posts),
+        'page_obj': paginator_create(request, posts, field='feed_date'),
         'posts': posts,
+        **caching.feed_cache(
+            request, caching.POSTS, caching.follows_scope(request.user.id)),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -114,17 +163,12 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if username != request.user.username and author.following.count() == 0:
-        Follow.objects.create(
-            user=request.user,
-            author=author,
-        )
+    following.follow(request.user, author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    unfollow = request.user.follower.filter(author=author)
-    unfollow.delete()
+    following.unfollow(request.user, author)
     return redirect('posts:profile', username=username)
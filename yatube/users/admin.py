@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import OutgoingEmail
+
+
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'to', 'status', 'attempts', 'scheduled')
+    list_filter = ('status',)
+    search_fields = ('to', 'subject')
+
+
+admin.site.register(OutgoingEmail, OutgoingEmailAdmin)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди пачками через одно соединение'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch', type=int, default=100,
+            help='Сколько писем отправлять за одно соединение')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться')
+        parser.add_argument(
+            '--sleep', type=float, default=5.0,
+            help='Пауза при пустой очереди, секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            emails = outbox.claim(options['batch'])
+            if not emails:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            sent = outbox.deliver(emails)
+            self.stdout.write(f'Отправлено {sent} из {len(emails)}')
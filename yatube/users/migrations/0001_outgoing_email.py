@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingEmail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(help_text='Тема', max_length=255)),
+                ('body', models.TextField(help_text='Текст письма')),
+                ('html_body', models.TextField(blank=True, help_text='HTML-версия')),
+                ('from_email', models.CharField(help_text='Отправитель', max_length=255)),
+                ('to', models.TextField(help_text='Получатели, по одному в строке')),
+                ('cc', models.TextField(blank=True, help_text='Копия')),
+                ('bcc', models.TextField(blank=True, help_text='Скрытая копия')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', help_text='Состояние', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0, help_text='Число попыток')),
+                ('scheduled', models.DateTimeField(default=django.utils.timezone.now, help_text='Не отправлять раньше этого времени')),
+                ('sent', models.DateTimeField(blank=True, help_text='Время отправки', null=True)),
+            ],
+            options={
+                'ordering': ['scheduled'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outgoingemail',
+            index=models.Index(fields=['status', 'scheduled'], name='outgoing_email_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='claimed',
+            field=models.DateTimeField(blank=True, help_text='Когда письмо забрал обработчик', null=True),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='headers',
+            field=models.TextField(blank=True, help_text='Дополнительные заголовки в JSON'),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='reply_to',
+            field=models.TextField(blank=True, help_text='Адреса для ответа'),
+        ),
+    ]
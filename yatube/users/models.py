@@ -0,0 +1,50 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку, см. users.outbox."""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.CharField(max_length=255, help_text='Тема')
+    body = models.TextField(help_text='Текст письма')
+    html_body = models.TextField(blank=True, help_text='HTML-версия')
+    from_email = models.CharField(max_length=255, help_text='Отправитель')
+    to = models.TextField(help_text='Получатели, по одному в строке')
+    cc = models.TextField(blank=True, help_text='Копия')
+    bcc = models.TextField(blank=True, help_text='Скрытая копия')
+    reply_to = models.TextField(blank=True, help_text='Адреса для ответа')
+    headers = models.TextField(
+        blank=True, help_text='Дополнительные заголовки в JSON')
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=PENDING,
+        help_text='Состояние')
+    attempts = models.PositiveSmallIntegerField(
+        default=0, help_text='Число попыток')
+    scheduled = models.DateTimeField(
+        default=timezone.now, help_text='Не отправлять раньше этого времени')
+    sent = models.DateTimeField(
+        null=True, blank=True, help_text='Время отправки')
+    claimed = models.DateTimeField(
+        null=True, blank=True, help_text='Когда письмо забрал обработчик')
+
+    class Meta:
+        ordering = ['scheduled']
+        indexes = [
+            models.Index(
+                fields=['status', 'scheduled'],
+                name='outgoing_email_queue_idx'),
+        ]
+
+    def __str__(self):
+        return self.subject
@@ -0,0 +1,150 @@
+"""Очередь исходящих писем.
+
+Обработчики запросов только ставят письма в очередь: EMAIL_BACKEND
+указывает на OutboxBackend, поэтому и send_mail, и письма Django вроде
+сброса пароля записываются в базу. Команда send_queued_mail разбирает
+очередь пачками через одно соединение с настоящим бэкендом
+OUTBOX_DELIVERY_BACKEND. Письмо, которое обработчик не отправил за
+OUTBOX_LEASE_SECONDS, возвращается в очередь.
+
+Вложения в очереди не хранятся: такие письма OutboxBackend не
+принимает, их нужно отправлять через настоящий бэкенд.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _join(addresses):
+    return '\n'.join(addresses or ())
+
+
+def _split(addresses):
+    return [address for address in addresses.split('\n') if address]
+
+
+class OutboxBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        outgoing = []
+        for message in email_messages:
+            try:
+                outgoing.append(to_outgoing(message))
+            except ValueError:
+                if not self.fail_silently:
+                    raise
+        OutgoingEmail.objects.bulk_create(outgoing)
+        return len(outgoing)
+
+
+def to_outgoing(message):
+    alternatives = getattr(message, 'alternatives', [])
+    html = [
+        content for content, mimetype in alternatives
+        if mimetype == 'text/html'
+    ]
+    if (message.attachments or len(html) != len(alternatives)
+            or len(html) > 1 or message.content_subtype != 'plain'):
+        raise ValueError(
+            f'Письмо «{message.subject}» с вложениями или нестандартными '
+            'частями нельзя поставить в очередь')
+    return OutgoingEmail(
+        subject=message.subject,
+        body=message.body,
+        html_body=html[0] if html else '',
+        from_email=message.from_email,
+        to=_join(message.to),
+        cc=_join(message.cc),
+        bcc=_join(message.bcc),
+        reply_to=_join(message.reply_to),
+        headers=(
+            json.dumps(message.extra_headers, ensure_ascii=False)
+            if message.extra_headers else ''),
+    )
+
+
+def to_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, _split(email.to),
+        cc=_split(email.cc), bcc=_split(email.bcc),
+        reply_to=_split(email.reply_to),
+        headers=json.loads(email.headers) if email.headers else None,
+        connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def release_stale():
+    """Возвращает в очередь письма упавших обработчиков.
+
+    Письмо могло уйти перед падением, поэтому возможен дубль: лучше
+    отправить дважды, чем потерять.
+    """
+    expired = timezone.now() - timedelta(
+        seconds=settings.OUTBOX_LEASE_SECONDS)
+    stale = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.SENDING, claimed__lt=expired)
+    ids = list(stale.values_list('id', flat=True))
+    released = stale.filter(id__in=ids).update(
+        status=OutgoingEmail.PENDING, attempts=F('attempts') + 1)
+    OutgoingEmail.objects.filter(
+        id__in=ids, status=OutgoingEmail.PENDING,
+        attempts__gte=settings.OUTBOX_MAX_ATTEMPTS,
+    ).update(status=OutgoingEmail.FAILED)
+    return released
+
+
+def claim(limit):
+    """Забирает письма из очереди; параллельные обработчики не мешают."""
+    release_stale()
+    candidates = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, scheduled__lte=timezone.now(),
+    ).values_list('id', flat=True)[:limit]
+    claimed = [
+        email_id for email_id in candidates
+        if OutgoingEmail.objects.filter(
+            id=email_id, status=OutgoingEmail.PENDING
+        ).update(status=OutgoingEmail.SENDING, claimed=timezone.now())
+    ]
+    return list(OutgoingEmail.objects.filter(id__in=claimed))
+
+
+def deliver(emails):
+    """Отправляет письма через одно соединение; вернет число отправленных."""
+    sent = 0
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+    with connection:
+        for email in emails:
+            try:
+                connection.send_messages([to_message(email, connection)])
+            except Exception:
+                logger.exception('Не удалось отправить письмо %s', email.id)
+                failed(email.id)
+                continue
+            OutgoingEmail.objects.filter(id=email.id).update(
+                status=OutgoingEmail.SENT, sent=timezone.now())
+            sent += 1
+    return sent
+
+
+def failed(email_id):
+    """Откладывает письмо с растущей паузой, пока не кончатся попытки."""
+    attempts = OutgoingEmail.objects.filter(id=email_id).values_list(
+        'attempts', flat=True).get()
+    delay = settings.OUTBOX_RETRY_DELAY * 2 ** attempts
+    OutgoingEmail.objects.filter(id=email_id).update(
+        status=OutgoingEmail.PENDING, attempts=F('attempts') + 1,
+        scheduled=timezone.now() + timedelta(seconds=delay))
+    OutgoingEmail.objects.filter(
+        id=email_id, attempts__gte=settings.OUTBOX_MAX_ATTEMPTS
+    ).update(status=OutgoingEmail.FAILED)
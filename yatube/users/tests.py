@@ -0,0 +1,131 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow
+
+from . import outbox
+from .models import OutgoingEmail
+
+User = get_user_model()
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP недоступен')
+
+
+@override_settings(
+    EMAIL_BACKEND='users.outbox.OutboxBackend',
+    OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class OutboxTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client = Client()
+
+    def send_queued_mail(self):
+        call_command('send_queued_mail', once=True, stdout=StringIO())
+
+    def test_signup_only_enqueues(self):
+        """Регистрация ставит письмо в очередь, но не отправляет его"""
+        self.client.post(reverse('users:signup'), {
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password1': 'Sup3r-secret',
+            'password2': 'Sup3r-secret',
+        })
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, 'newbie@example.com')
+        self.assertIn('/profile/newbie/', email.body)
+        self.assertEqual(mail.outbox, [])
+
+    def test_follow_notifies_author(self):
+        """Автор получает письмо о новом подписчике"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.to, 'author@example.com')
+        self.assertIn('reader', email.body)
+
+    def test_password_reset_goes_through_outbox(self):
+        """Письма Django вроде сброса пароля тоже идут через очередь"""
+        self.client.post(
+            reverse('users:password_reset'), {'email': 'author@example.com'})
+        self.assertTrue(
+            OutgoingEmail.objects.filter(to='author@example.com').exists())
+
+    def test_worker_sends_queued_mail(self):
+        """Обработчик отправляет очередь и отмечает письма отправленными"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.send_queued_mail()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        self.assertIsNotNone(email.sent)
+
+    def test_reply_to_and_headers_survive_queue(self):
+        """Адрес для ответа и заголовки доходят до настоящего бэкенда"""
+        EmailMessage(
+            'Тема', 'Текст', to=['author@example.com'],
+            reply_to=['support@example.com'],
+            headers={'List-Unsubscribe': '<mailto:stop@example.com>'},
+        ).send()
+        self.send_queued_mail()
+        message = mail.outbox[0]
+        self.assertEqual(message.reply_to, ['support@example.com'])
+        self.assertEqual(
+            message.extra_headers['List-Unsubscribe'],
+            '<mailto:stop@example.com>')
+
+    def test_attachments_are_rejected(self):
+        """Письмо с вложением не ставится в очередь молча без вложения"""
+        message = EmailMessage('Тема', 'Текст', to=['author@example.com'])
+        message.attach('report.txt', 'данные', 'text/plain')
+        with self.assertRaises(ValueError):
+            message.send()
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    @override_settings(OUTBOX_LEASE_SECONDS=60)
+    def test_stale_sending_returns_to_queue(self):
+        """Письмо упавшего обработчика возвращается в очередь"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(len(outbox.claim(10)), 1)
+        self.assertEqual(outbox.claim(10), [])
+        OutgoingEmail.objects.update(
+            claimed=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(len(outbox.claim(10)), 1)
+        self.assertEqual(OutgoingEmail.objects.get().attempts, 1)
+
+    @override_settings(
+        OUTBOX_DELIVERY_BACKEND='users.tests.FailingBackend',
+        OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_failed_mail_is_retried_then_given_up(self):
+        """Неотправленное письмо повторяется, а затем помечается ошибкой"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertLogs('users.outbox', 'ERROR'):
+            self.send_queued_mail()
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertGreater(email.scheduled, timezone.now())
+        self.send_queued_mail()
+        OutgoingEmail.objects.update(scheduled=timezone.now())
+        with self.assertLogs('users.outbox', 'ERROR'):
+            self.send_queued_mail()
+        self.assertEqual(
+            OutgoingEmail.objects.get().status, OutgoingEmail.FAILED)
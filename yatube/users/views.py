@@ -1,7 +1,9 @@
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
 from django.views.generic import CreateView
-from django.urls import reverse_lazy
+
 from .forms import CreationForm
-from django.core.mail import send_mail
 
 
 class SignUp(CreateView):
@@ -9,11 +11,19 @@ class SignUp(CreateView):
     success_url = reverse_lazy('posts:main_page')
     template_name = 'users/signup.html'
 
-
-send_mail(
-    'Тема письма',
-    'Текст письма.',
-    'from@example.com',
-    ['to@example.com'],
-    fail_silently=False,
-)
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        user = self.object
+        if user.email:
+            # Письмо только ставится в очередь, см. users.outbox
+            send_mail(
+                'Добро пожаловать в Yatube',
+                render_to_string('users/emails/signup.txt', {
+                    'user': user,
+                    'profile_url': self.request.build_absolute_uri(
+                        reverse('posts:profile', args=(user.username,))),
+                }),
+                None,
+                [user.email],
+            )
+        return response
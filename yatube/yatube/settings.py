@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -27,10 +28,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,28 +40,48 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# В продакшене (YATUBE_CACHED_TEMPLATES=1 или DEBUG = False) шаблоны
+# разбираются один раз на процесс, а wsgi.py заранее компилирует все
+# шаблоны из TEMPLATES_DIR, см. core.template_cache
+CACHED_TEMPLATES = os.environ.get(
+    'YATUBE_CACHED_TEMPLATES', '0' if DEBUG else '1') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': (
+                [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+                if CACHED_TEMPLATES else TEMPLATE_LOADERS
+            ),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.posts_count.posts_count',
             ],
         },
     },
 ]
+# debug_toolbar ищет свои шаблоны через APP_DIRS, но вместе со списком
+# loaders он запрещен; app_directories.Loader в TEMPLATE_LOADERS делает
+# то же самое, а проверка смотрит только на APP_DIRS
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -67,9 +89,98 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живет между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': 60,
+        # Тестовая база тоже в файле: в памяти с общим кэшем SQLite
+        # блокирует таблицы и не ждет по busy_timeout, как в работе
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3')},
     }
 }
 
+# Реплики только для чтения, например YATUBE_REPLICAS=replica1,replica2.
+# Это копии default рядом с ней, их обновляет команда sync_replicas.
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('YATUBE_REPLICAS', '').split(',')
+    if alias
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'{alias}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Только чтение: эти страницы можно отдавать с реплики
+REPLICA_VIEWS = {
+    'posts:main_page',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+    'posts:search',
+    'posts:trending',
+    'api:list',
+    'api:detail',
+    'api:export',
+}
+# Сколько секунд после записи клиент читает только с default
+REPLICA_STICKY_SECONDS = 15
+# Фрагменты лент с реплики живут не дольше ее типичного отставания
+REPLICA_CACHE_TIMEOUT = 60
+
+# Общий для всех процессов кэш: YATUBE_MEMCACHED=127.0.0.1:11211.
+# Без него у каждого процесса свой LocMem, и версии фрагментов (см.
+# posts.caching), поднятые в одном процессе, другие не видят: тогда
+# фрагменты и карточки живут недолго, а сессии хранятся в базе.
+MEMCACHED_LOCATION = os.environ.get('YATUBE_MEMCACHED')
+SHARED_CACHE = bool(MEMCACHED_LOCATION)
+CACHES = {
+    'default': (
+        {
+            'BACKEND': 'core.metrics.InstrumentedMemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION,
+        }
+        if SHARED_CACHE else
+        {'BACKEND': 'core.metrics.InstrumentedLocMemCache'}
+    ),
+}
+
+# Хранилище сессий, например YATUBE_SESSIONS=signed_cookies. В db и
+# cached_db сессию можно отозвать на сервере; cached_db читает ее из
+# кэша, а signed_cookies вовсе не ходит в базу, но хранит данные у
+# клиента (подписанными, не зашифрованными) до истечения срока.
+# cached_db по умолчанию только с общим кэшем: в LocMem другого
+# процесса удаленная сессия осталась бы живой
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get(
+    'YATUBE_SESSIONS', 'cached_db' if SHARED_CACHE else 'db')]
+
+# Сессии, созданные до CachedModelBackend, продолжают работать через
+# ModelBackend, пока пользователь не войдет заново
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+# Сколько секунд кэш помнит строку вошедшего пользователя, 0 - нисколько.
+# Только с общим кэшем: сброс записи должен дойти до всех процессов
+AUTH_USER_CACHE_SECONDS = 30 if SHARED_CACHE else 0
+
+# Применяются к каждому новому соединению SQLite, см. core.db
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -84,7 +195,19 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Запросы только ставят письма в очередь, отправляет их send_queued_mail
+EMAIL_BACKEND = 'users.outbox.OutboxBackend'
+
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+OUTBOX_MAX_ATTEMPTS = 3
+
+# Пауза перед повтором, удваивается с каждой неудачей, секунд
+OUTBOX_RETRY_DELAY = 60
+# Письмо, не отправленное обработчиком за столько секунд, снова в очереди
+OUTBOX_LEASE_SECONDS = 10 * 60
+
+DEFAULT_FROM_EMAIL = 'noreply@yatube.ru'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -112,12 +235,73 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
-
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+# За обратным прокси REMOTE_ADDR — адрес самого прокси, и с ним
+# /metrics/ открылся бы всем. Тогда укажите заголовок с адресом
+# клиента, который прокси перезаписывает в каждом запросе, например
+# YATUBE_METRICS_IP_HEADER=HTTP_X_REAL_IP для nginx с
+# proxy_set_header X-Real-IP $remote_addr; доступ проверяется по нему.
+METRICS_CLIENT_IP_HEADER = os.environ.get('YATUBE_METRICS_IP_HEADER')
+
+# Бюджеты запросов к базе по имени view: превышение пишется в лог,
+# а с QUERY_BUDGET_STRICT = True приводит к ошибке (удобно в тестах)
+VIEW_QUERY_BUDGETS = {
+    'posts:main_page': 5,
+    'posts:group_list': 7,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:follow_index': 6,
+}
+QUERY_BUDGET_STRICT = False
+
+# Посты авторов, у которых подписчиков не меньше этого порога, не
+# раскладываются по лентам читателей, а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Фрагменты лент сбрасываются сигналами, поэтому в общем кэше живут
+# долго; в кэше процесса сброс из другого процесса не виден
+FEED_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 60
+# Ключ карточки меняется вместе с постом, ее можно хранить еще дольше;
+# без общего кэша устаревают только имена авторов и названия групп
+CARD_CACHE_TIMEOUT = 24 * 60 * 60 if SHARED_CACHE else 5 * 60
+# Подписки читателя, см. posts.following; версия меняется при подписке,
+# но в кэше процесса подписка из другого процесса не видна
+FOLLOWING_CACHE_TIMEOUT = 24 * 60 * 60 if SHARED_CACHE else 60
+
+# Размеры миниатюр картинок постов, которые заранее готовит команда
+# render_thumbnails: имя варианта -> (геометрия, опции sorl-thumbnail)
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Адаптивные варианты картинок для srcset: ширины, форматы в порядке
+# предпочтения и качество сжатия; высота держит пропорции карточки.
+# WEBP пропускается, если Pillow собран без него
+POST_IMAGE_WIDTHS = (320, 480, 720, 960, 1280, 1920)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_IMAGE_QUALITY = 80
+THUMBNAIL_MAX_ATTEMPTS = 3
+# Задача, которую обработчик не закончил за столько секунд (процесс
+# упал или был убит), возвращается в очередь как неудачная попытка
+THUMBNAIL_LEASE_SECONDS = 10 * 60
+# Картинка без ссылок из постов удаляется командой collect_media не
+# раньше, чем через столько секунд: ее могут как раз загружать заново
+MEDIA_GC_GRACE = 60 * 60
+
+# Выгрузка API (api:export) доступна сотрудникам и с заголовком
+# Authorization: Token <YATUBE_API_EXPORT_TOKEN>, не чаще
+# API_EXPORT_LIMIT раз за API_EXPORT_PERIOD секунд на клиента
+API_EXPORT_TOKEN = os.environ.get('YATUBE_API_EXPORT_TOKEN')
+API_EXPORT_LIMIT = 10
+API_EXPORT_PERIOD = 60 * 60
+
+# Сколько самых новых совпадений поиска ранжируется по релевантности
+SEARCH_RANK_WINDOW = 500
+
+# Популярные посты, см. posts.trending: длина списка окна и вес нового
+# подписчика автора относительно комментария
+TRENDING_LIMIT = 50
+TRENDING_FOLLOW_WEIGHT = 3
@@ -1,6 +1,12 @@
 import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.CACHED_TEMPLATES:
+    # Первые запросы процесса не платят за разбор шаблонов
+    from core.template_cache import warm_up
+    warm_up()